@@ -0,0 +1,137 @@
+"""Switch the primary and foreign keys to native uuid
+
+Revision ID: a8e4b6d0c135
+Revises: f3a9c2d71e48
+Create Date: 2026-10-18 20:31:09.664210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8e4b6d0c135'
+down_revision: Union[str, None] = 'f3a9c2d71e48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+KEY_COLUMNS = {
+    'users': ['id'],
+    'operations': ['id', 'operator_id'],
+    'bids': ['id', 'investor_id', 'operation_id'],
+}
+# Small tables whose key column is simply retyped in place.
+SMALL_TABLE_KEYS = {
+    'operator_stats': 'operator_id',
+    'investor_stats': 'investor_id',
+    'operator_deadline_stats': 'operator_id',
+    'investor_deadline_stats': 'investor_id',
+    'user_import_jobs': 'id',
+}
+FOREIGN_KEYS = [
+    ('operations', 'operator_id', 'users', ''),
+    ('bids', 'investor_id', 'users', ''),
+    ('bids', 'operation_id', 'operations', ''),
+    ('operator_stats', 'operator_id', 'users', ' ON DELETE CASCADE'),
+    ('investor_stats', 'investor_id', 'users', ' ON DELETE CASCADE'),
+    ('operator_deadline_stats', 'operator_id', 'users', ' ON DELETE CASCADE'),
+    ('investor_deadline_stats', 'investor_id', 'users', ' ON DELETE CASCADE'),
+]
+# The indexes on key columns, rebuilt on the uuid columns before the swap.
+INDEXES = {
+    'ix_operations_operator_id_created_at': ('operations', 'operator_id_uuid, created_at', ''),
+    'ix_operations_open_created_at': ('operations', 'created_at, id_uuid', ' WHERE status = true'),
+    'ix_operations_open_deadline': ('operations', 'deadline, id_uuid', ' WHERE status = true'),
+    'ix_bids_investor_id_bid_date': ('bids', 'investor_id_uuid, bid_date', ''),
+    'ix_bids_operation_id': ('bids', 'operation_id_uuid', ''),
+}
+
+
+def _upgrade_postgresql() -> None:
+    with op.get_context().autocommit_block():
+        # Whatever uuid_backfill.py has not converted yet; nothing when it ran to completion.
+        for table, columns in KEY_COLUMNS.items():
+            assignments = ", ".join(f"{column}_uuid = {column}::uuid" for column in columns)
+            op.execute(f"UPDATE {table} SET {assignments} WHERE id_uuid IS NULL")
+
+        for table in KEY_COLUMNS:
+            op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {table}_id_uuid_key ON {table} (id_uuid)")
+            # A validated check lets SET NOT NULL below skip its full table scan.
+            op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_id_uuid_not_null")
+            op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_id_uuid_not_null CHECK (id_uuid IS NOT NULL) NOT VALID")
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_id_uuid_not_null")
+        for name, (table, columns, where) in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name}_uuid ON {table} ({columns}){where}")
+
+    # The swap only touches the catalog (plus the small tables), so the exclusive
+    # locks are held briefly. Give up rather than queue behind a long transaction; everything
+    # above is idempotent, so the upgrade can simply be run again.
+    op.execute("SET LOCAL lock_timeout = '5s'")
+    for table, column, _, _ in FOREIGN_KEYS:
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {table}_{column}_fkey")
+    for table, columns in KEY_COLUMNS.items():
+        op.execute(f"DROP TRIGGER {table}_sync_uuid_keys ON {table}")
+        op.execute(f"DROP FUNCTION {table}_sync_uuid_keys()")
+        # Dropping the text columns drops their primary key and indexes with them.
+        op.execute(f"ALTER TABLE {table} " + ", ".join(f"DROP COLUMN {column}" for column in columns))
+        for column in columns:
+            op.execute(f"ALTER TABLE {table} RENAME COLUMN {column}_uuid TO {column}")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN id SET NOT NULL")
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {table}_id_uuid_not_null")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY USING INDEX {table}_id_uuid_key")
+    for name in INDEXES:
+        op.execute(f"ALTER INDEX {name}_uuid RENAME TO {name}")
+    for table, column in SMALL_TABLE_KEYS.items():
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE uuid USING {column}::uuid")
+    for table, column, referenced, action in FOREIGN_KEYS:
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) "
+            f"REFERENCES {referenced} (id){action} NOT VALID"
+        )
+
+    # Validating scans the referencing tables without blocking writes.
+    with op.get_context().autocommit_block():
+        for table, column, _, _ in FOREIGN_KEYS:
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_{column}_fkey")
+
+
+def _sqlite_columns():
+    for table, columns in KEY_COLUMNS.items():
+        for column in columns:
+            yield table, column
+    yield from SMALL_TABLE_KEYS.items()
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name == 'postgresql':
+        _upgrade_postgresql()
+        return
+    # Elsewhere the uuid type is CHAR(32): the same hex digits without the dashes.
+    for table, column in _sqlite_columns():
+        op.execute(f"UPDATE {table} SET {column} = lower(replace({column}, '-', ''))")
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        for table, column in _sqlite_columns():
+            dashed = " || '-' || ".join(
+                f"substr({column}, {start}, {length})" for start, length in ((1, 8), (9, 4), (13, 4), (17, 4), (21, 12))
+            )
+            op.execute(f"UPDATE {table} SET {column} = {dashed} WHERE length({column}) = 32")
+        return
+    # Not online: every key column is rewritten in place while the tables are locked.
+    for table, column, _, _ in FOREIGN_KEYS:
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {table}_{column}_fkey")
+    for table, columns in KEY_COLUMNS.items():
+        op.execute(
+            f"ALTER TABLE {table} "
+            + ", ".join(f"ALTER COLUMN {column} TYPE varchar USING {column}::text" for column in columns)
+        )
+    for table, column in SMALL_TABLE_KEYS.items():
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE varchar USING {column}::text")
+    for table, column, referenced, action in FOREIGN_KEYS:
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) "
+            f"REFERENCES {referenced} (id){action}"
+        )
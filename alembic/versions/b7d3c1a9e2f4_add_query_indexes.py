@@ -0,0 +1,59 @@
+"""Add indexes for the hot query paths
+
+Revision ID: b7d3c1a9e2f4
+Revises: 07abf5513c91
+Create Date: 2026-10-18 09:12:44.501233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3c1a9e2f4'
+down_revision: Union[str, None] = '07abf5513c91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Emails used to be free to repeat. A failed unique build would leave an INVALID index
+    # behind, so stop before building it until the duplicates are merged by hand.
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT email, count(*) FROM users GROUP BY email HAVING count(*) > 1 ORDER BY email LIMIT 20"
+    )).all()
+    if duplicates:
+        listed = ", ".join(f"{email} ({count})" for email, count in duplicates)
+        raise RuntimeError(f"users.email must be unique before ix_users_email is built; duplicated: {listed}")
+
+    # CONCURRENTLY cannot run inside a transaction, so build the indexes in autocommit
+    # mode to avoid locking the tables against writes on a live database.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_email', 'users', ['email'], unique=True, postgresql_concurrently=True)
+        op.create_index('ix_users_role', 'users', ['role'], unique=False, postgresql_concurrently=True)
+        op.create_index(
+            'ix_operations_operator_id_created_at', 'operations', ['operator_id', 'created_at'],
+            unique=False, postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_operations_open_created_at', 'operations', ['created_at', 'id'], unique=False,
+            postgresql_where=sa.text('status = true'), sqlite_where=sa.text('status = 1'),
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_bids_investor_id_bid_date', 'bids', ['investor_id', 'bid_date'],
+            unique=False, postgresql_concurrently=True
+        )
+        op.create_index('ix_bids_operation_id', 'bids', ['operation_id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_bids_operation_id', table_name='bids', postgresql_concurrently=True)
+        op.drop_index('ix_bids_investor_id_bid_date', table_name='bids', postgresql_concurrently=True)
+        op.drop_index('ix_operations_open_created_at', table_name='operations', postgresql_concurrently=True)
+        op.drop_index('ix_operations_operator_id_created_at', table_name='operations', postgresql_concurrently=True)
+        op.drop_index('ix_users_role', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_users_email', table_name='users', postgresql_concurrently=True)
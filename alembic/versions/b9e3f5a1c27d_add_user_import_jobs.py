@@ -0,0 +1,39 @@
+"""Keep the bulk user import jobs in the database
+
+Revision ID: b9e3f5a1c27d
+Revises: b7d3c1a9e2f4
+Create Date: 2026-10-18 14:52:37.504918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e3f5a1c27d'
+down_revision: Union[str, None] = 'b7d3c1a9e2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_import_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('format', sa.String(length=10), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.Column('created', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.JSON(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_user_import_jobs_started_at'), 'user_import_jobs', ['started_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_user_import_jobs_started_at'), table_name='user_import_jobs')
+    op.drop_table('user_import_jobs')
@@ -0,0 +1,158 @@
+"""Partition bids by bid_date and add the archive tables
+
+Revision ID: c4d8e2a7b619
+Revises: a8e4b6d0c135
+Create Date: 2026-10-18 22:04:51.118236
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8e2a7b619'
+down_revision: Union[str, None] = 'a8e4b6d0c135'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Monthly partitions created ahead by the migration; partitions.py keeps adding them afterwards.
+MONTHS_AHEAD = 3
+
+
+def _month_start(day: date, offset: int = 0) -> date:
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _partition_bids_postgresql() -> None:
+    # The existing table becomes bids_history, the partition of everything before next month.
+    # Its key, bound and NOT NULL are prepared without blocking writes, so attaching it below
+    # needs neither a table scan nor an index build.
+    boundary = _month_start(date.today(), 1)
+    with op.get_context().autocommit_block():
+        op.execute("UPDATE bids SET bid_date = now() WHERE bid_date IS NULL")
+        op.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS bids_history_pkey ON bids (id, bid_date)")
+        op.execute("ALTER TABLE bids DROP CONSTRAINT IF EXISTS bids_history_bound")
+        op.execute(
+            f"ALTER TABLE bids ADD CONSTRAINT bids_history_bound "
+            f"CHECK (bid_date IS NOT NULL AND bid_date < '{boundary.isoformat()}') NOT VALID"
+        )
+        op.execute("ALTER TABLE bids VALIDATE CONSTRAINT bids_history_bound")
+        op.create_index(
+            'ix_operations_closed_deadline', 'operations', ['deadline', 'id'], unique=False,
+            postgresql_where=sa.text('status = false'), postgresql_concurrently=True, if_not_exists=True
+        )
+
+    op.execute("SET LOCAL lock_timeout = '5s'")
+    op.execute("ALTER TABLE bids RENAME TO bids_history")
+    op.execute("ALTER TABLE bids_history ALTER COLUMN bid_date SET NOT NULL")
+    op.execute("ALTER TABLE bids_history DROP CONSTRAINT bids_pkey")
+    op.execute("ALTER TABLE bids_history ADD CONSTRAINT bids_history_pkey PRIMARY KEY USING INDEX bids_history_pkey")
+    op.execute("ALTER INDEX ix_bids_investor_id_bid_date RENAME TO bids_history_investor_id_bid_date_idx")
+    op.execute("ALTER INDEX ix_bids_operation_id RENAME TO bids_history_operation_id_idx")
+    op.execute("ALTER TABLE bids_history RENAME CONSTRAINT bids_investor_id_fkey TO bids_history_investor_id_fkey")
+    op.execute("ALTER TABLE bids_history RENAME CONSTRAINT bids_operation_id_fkey TO bids_history_operation_id_fkey")
+    op.execute("""
+CREATE TABLE bids (
+    id uuid NOT NULL,
+    investor_id uuid,
+    operation_id uuid,
+    invested_amount numeric(15, 2) NOT NULL,
+    interest_rate numeric(5, 2) NOT NULL,
+    bid_date timestamp without time zone NOT NULL,
+    CONSTRAINT bids_pkey PRIMARY KEY (id, bid_date),
+    CONSTRAINT bids_investor_id_fkey FOREIGN KEY (investor_id) REFERENCES users (id),
+    CONSTRAINT bids_operation_id_fkey FOREIGN KEY (operation_id) REFERENCES operations (id)
+) PARTITION BY RANGE (bid_date)""")
+    op.execute("CREATE INDEX ix_bids_investor_id_bid_date ON bids (investor_id, bid_date)")
+    op.execute("CREATE INDEX ix_bids_operation_id ON bids (operation_id)")
+    # The matching key, indexes and foreign keys of bids_history are adopted as they are.
+    op.execute(f"ALTER TABLE bids ATTACH PARTITION bids_history FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat()}')")
+    op.execute("ALTER TABLE bids_history DROP CONSTRAINT bids_history_bound")
+    for offset in range(MONTHS_AHEAD):
+        start, end = _month_start(boundary, offset), _month_start(boundary, offset + 1)
+        op.execute(
+            f"CREATE TABLE bids_{start:%Y_%m} PARTITION OF bids "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    op.execute("CREATE TABLE bids_default PARTITION OF bids DEFAULT")
+
+
+def _unpartition_bids_postgresql() -> None:
+    # Not online: every bid is copied back into a plain table.
+    op.execute("ALTER TABLE bids RENAME TO bids_partitioned")
+    op.execute("ALTER INDEX ix_bids_investor_id_bid_date RENAME TO bids_partitioned_investor_id_bid_date_idx")
+    op.execute("ALTER INDEX ix_bids_operation_id RENAME TO bids_partitioned_operation_id_idx")
+    op.execute("ALTER TABLE bids_partitioned RENAME CONSTRAINT bids_pkey TO bids_partitioned_pkey")
+    op.execute("CREATE TABLE bids (LIKE bids_partitioned INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO bids SELECT * FROM bids_partitioned")
+    op.execute("DROP TABLE bids_partitioned")
+    op.execute("ALTER TABLE bids ADD CONSTRAINT bids_pkey PRIMARY KEY (id)")
+    op.execute("ALTER TABLE bids ALTER COLUMN bid_date DROP NOT NULL")
+    op.execute("ALTER TABLE bids ADD CONSTRAINT bids_investor_id_fkey FOREIGN KEY (investor_id) REFERENCES users (id)")
+    op.execute("ALTER TABLE bids ADD CONSTRAINT bids_operation_id_fkey FOREIGN KEY (operation_id) REFERENCES operations (id)")
+    op.create_index('ix_bids_investor_id_bid_date', 'bids', ['investor_id', 'bid_date'], unique=False)
+    op.create_index('ix_bids_operation_id', 'bids', ['operation_id'], unique=False)
+
+
+def upgrade() -> None:
+    op.create_table('archived_operations',
+    sa.Column('id', sa.Uuid(as_uuid=False), nullable=False),
+    sa.Column('operator_id', sa.Uuid(as_uuid=False), nullable=True),
+    sa.Column('required_amount', sa.DECIMAL(precision=15, scale=2), nullable=False),
+    sa.Column('annual_interest', sa.DECIMAL(precision=5, scale=2), nullable=False),
+    sa.Column('deadline', sa.Date(), nullable=False),
+    sa.Column('current_amount', sa.DECIMAL(precision=15, scale=2), nullable=True),
+    sa.Column('status', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['operator_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_archived_operations_operator_id', 'archived_operations', ['operator_id'], unique=False)
+    op.create_table('archived_bids',
+    sa.Column('id', sa.Uuid(as_uuid=False), nullable=False),
+    sa.Column('investor_id', sa.Uuid(as_uuid=False), nullable=True),
+    sa.Column('operation_id', sa.Uuid(as_uuid=False), nullable=True),
+    sa.Column('invested_amount', sa.DECIMAL(precision=15, scale=2), nullable=False),
+    sa.Column('interest_rate', sa.DECIMAL(precision=5, scale=2), nullable=False),
+    sa.Column('bid_date', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['investor_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['operation_id'], ['archived_operations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_archived_bids_investor_id_bid_date', 'archived_bids', ['investor_id', 'bid_date'], unique=False)
+    op.create_index('ix_archived_bids_operation_id', 'archived_bids', ['operation_id'], unique=False)
+
+    if op.get_context().dialect.name == 'postgresql':
+        _partition_bids_postgresql()
+    else:
+        # Only PostgreSQL partitions; elsewhere bids stays a single table.
+        op.create_index(
+            'ix_operations_closed_deadline', 'operations', ['deadline', 'id'], unique=False,
+            sqlite_where=sa.text('status = 0')
+        )
+
+
+def downgrade() -> None:
+    # Archived operations go back to the hot tables before the archive is dropped.
+    op.execute(
+        "INSERT INTO operations (id, operator_id, required_amount, annual_interest, deadline, current_amount, status, created_at) "
+        "SELECT id, operator_id, required_amount, annual_interest, deadline, current_amount, status, created_at "
+        "FROM archived_operations"
+    )
+    op.execute(
+        "INSERT INTO bids (id, investor_id, operation_id, invested_amount, interest_rate, bid_date) "
+        "SELECT id, investor_id, operation_id, invested_amount, interest_rate, bid_date FROM archived_bids"
+    )
+    if op.get_context().dialect.name == 'postgresql':
+        _unpartition_bids_postgresql()
+    op.drop_index('ix_operations_closed_deadline', table_name='operations')
+    op.drop_index('ix_archived_bids_operation_id', table_name='archived_bids')
+    op.drop_index('ix_archived_bids_investor_id_bid_date', table_name='archived_bids')
+    op.drop_table('archived_bids')
+    op.drop_index('ix_archived_operations_operator_id', table_name='archived_operations')
+    op.drop_table('archived_operations')
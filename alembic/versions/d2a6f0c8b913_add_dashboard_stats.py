@@ -0,0 +1,66 @@
+"""Add the per-operator and per-investor dashboard totals
+
+Revision ID: d2a6f0c8b913
+Revises: b9e3f5a1c27d
+Create Date: 2026-10-18 15:40:12.873104
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a6f0c8b913'
+down_revision: Union[str, None] = 'b9e3f5a1c27d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('operator_stats',
+    sa.Column('operator_id', sa.String(), nullable=False),
+    sa.Column('operations', sa.Integer(), nullable=False),
+    sa.Column('open_operations', sa.Integer(), nullable=False),
+    sa.Column('required_amount', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.Column('raised_amount', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.Column('open_required_amount', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.Column('open_raised_amount', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.Column('bids', sa.Integer(), nullable=False),
+    sa.Column('bid_amount', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.Column('weighted_rate_sum', sa.DECIMAL(precision=22, scale=4), nullable=False),
+    sa.ForeignKeyConstraint(['operator_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('operator_id')
+    )
+    op.create_table('investor_stats',
+    sa.Column('investor_id', sa.String(), nullable=False),
+    sa.Column('bids', sa.Integer(), nullable=False),
+    sa.Column('invested_amount', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.Column('weighted_rate_sum', sa.DECIMAL(precision=22, scale=4), nullable=False),
+    sa.Column('open_invested_amount', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['investor_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('investor_id')
+    )
+    op.create_table('operator_deadline_stats',
+    sa.Column('operator_id', sa.String(), nullable=False),
+    sa.Column('deadline', sa.Date(), nullable=False),
+    sa.Column('open_unfunded_amount', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['operator_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('operator_id', 'deadline')
+    )
+    op.create_table('investor_deadline_stats',
+    sa.Column('investor_id', sa.String(), nullable=False),
+    sa.Column('deadline', sa.Date(), nullable=False),
+    sa.Column('open_invested_amount', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['investor_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('investor_id', 'deadline')
+    )
+    # Existing history is backfilled with `python shared/python/dashboard_stats.py`.
+
+
+def downgrade() -> None:
+    op.drop_table('investor_deadline_stats')
+    op.drop_table('operator_deadline_stats')
+    op.drop_table('investor_stats')
+    op.drop_table('operator_stats')
@@ -0,0 +1,33 @@
+"""Add a partial index on the deadline of open operations
+
+Revision ID: e5c19a7d4b20
+Revises: d2a6f0c8b913
+Create Date: 2026-10-18 17:05:31.412786
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c19a7d4b20'
+down_revision: Union[str, None] = 'd2a6f0c8b913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Used by the expiry sweep; it only covers open operations, so it stays small.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_operations_open_deadline', 'operations', ['deadline', 'id'], unique=False,
+            postgresql_where=sa.text('status = true'), sqlite_where=sa.text('status = 1'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_operations_open_deadline', table_name='operations', postgresql_concurrently=True)
@@ -0,0 +1,58 @@
+"""Add native uuid shadow columns for the primary and foreign keys
+
+Revision ID: f3a9c2d71e48
+Revises: e5c19a7d4b20
+Create Date: 2026-10-18 20:12:47.301562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c2d71e48'
+down_revision: Union[str, None] = 'e5c19a7d4b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# First step of the online switch from text keys to uuid on PostgreSQL. Every key column gets a
+# nullable uuid twin that a trigger fills on insert and update, so rows written from now on never
+# need backfilling. Existing rows are converted in small batches by
+# `python shared/python/uuid_backfill.py` while the application keeps running, and the next
+# revision swaps the columns. SQLite has no native uuid; its conversion happens in the next revision.
+KEY_COLUMNS = {
+    'users': ['id'],
+    'operations': ['id', 'operator_id'],
+    'bids': ['id', 'investor_id', 'operation_id'],
+}
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    for table, columns in KEY_COLUMNS.items():
+        # Adding a nullable column without a default only touches the catalog.
+        op.execute(f"ALTER TABLE {table} " + ", ".join(f"ADD COLUMN {column}_uuid uuid" for column in columns))
+        assignments = "\n".join(f"    NEW.{column}_uuid := NEW.{column}::uuid;" for column in columns)
+        op.execute(f"""
+CREATE FUNCTION {table}_sync_uuid_keys() RETURNS trigger AS $$
+BEGIN
+{assignments}
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql""")
+        op.execute(
+            f"CREATE TRIGGER {table}_sync_uuid_keys BEFORE INSERT OR UPDATE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {table}_sync_uuid_keys()"
+        )
+
+
+def downgrade() -> None:
+    # IF EXISTS: downgrading the swap already converted the keys back and dropped these.
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    for table, columns in KEY_COLUMNS.items():
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_uuid_keys ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS {table}_sync_uuid_keys()")
+        op.execute(f"ALTER TABLE {table} " + ", ".join(f"DROP COLUMN IF EXISTS {column}_uuid" for column in columns))
@@ -0,0 +1,137 @@
+"""Latency of well-behaved clients while another client floods the login endpoint.
+
+Boots the app in process against a fresh database, then for each of two runs, one with
+the admission limits off and one with them on, lets --abusers concurrent tasks from a
+single address post wrong passwords to /token, up to --flood-rate per second, while
+--clients investors, each from its own address, log in and browse their listings at a
+human pace. Reports the well-behaved p50/p95/p99 latency, how often they were asked to
+retry and what the flood got back:
+
+    python benchmarks/admission_load.py --database-url sqlite:///./admission_load.db --duration 15
+
+The target database is dropped and recreated, never point it at real data.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(samples: list) -> str:
+    if not samples:
+        return "no samples"
+    p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+    return f"{len(samples)} req  p50 {p50:.0f}ms  p95 {p95:.0f}ms  p99 {p99:.0f}ms"
+
+
+async def flood(app, stop: float, pause: float, statuses: Counter):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app, client=("203.0.113.66", 40000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+        while time.perf_counter() < stop:
+            response = await client.post("/token", json={"username": "admin@admin.com", "password": "wrong"})
+            statuses[response.status_code] += 1
+            # Retry-After is ignored; the pause only keeps the client's own CPU out of the numbers.
+            await asyncio.sleep(pause)
+
+
+async def timed(client, method: str, path: str, latencies: dict, rejected: Counter, **kwargs):
+    """Send a request, waiting out Retry-After like a browser script would, and record its latency."""
+    while True:
+        started = time.perf_counter()
+        response = await client.request(method, path, **kwargs)
+        if response.status_code not in (429, 503):
+            latencies[f"{method} {path}"].append(time.perf_counter() - started)
+            response.raise_for_status()
+            return response
+        rejected[response.status_code] += 1
+        await asyncio.sleep(float(response.headers["retry-after"]))
+
+
+async def browse(app, index: int, stop: float, latencies: dict, rejected: Counter):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app, client=(f"198.51.100.{index + 1}", 40000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+        credentials = {"username": f"investor{index}@admission.test", "password": "investor"}
+        while time.perf_counter() < stop:
+            response = await timed(client, "POST", "/token", latencies, rejected, json=credentials)
+            client.cookies.set("token", response.cookies["token"])
+            for _ in range(10):
+                for path in ("/api/investor/operations", "/investor_dashboard"):
+                    await timed(client, "GET", path, latencies, rejected)
+                    await asyncio.sleep(0.2)
+
+
+async def measure(app, args, enabled: bool):
+    import admission
+
+    admission.RATE_LIMIT_ENABLED = enabled
+    stop = time.perf_counter() + args.duration
+    latencies = {"POST /token": [], "GET /api/investor/operations": [], "GET /investor_dashboard": []}
+    statuses, rejected = Counter(), Counter()
+    await asyncio.gather(
+        *(flood(app, stop, args.abusers / args.flood_rate, statuses) for _ in range(args.abusers)),
+        *(browse(app, index, stop, latencies, rejected) for index in range(args.clients)),
+    )
+    print(f"\nadmission limits {'on' if enabled else 'off'}")
+    for route, samples in latencies.items():
+        print(f"  {route:32} {percentiles(samples)}")
+    print(f"  well-behaved rejections: {dict(sorted(rejected.items()))}")
+    print(f"  flood responses: {dict(sorted(statuses.items()))}")
+
+
+async def run(args):
+    import httpx
+    import admission
+    from connection import Base, get_engine
+    import models  # noqa: F401 registers the tables
+    from main import app
+
+    async with get_engine().begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with app.router.lifespan_context(app):
+        admission.RATE_LIMIT_ENABLED = False
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as admin:
+            login = await admin.post("/token", json={"username": "admin@admin.com", "password": "admin"})
+            admin.cookies.set("token", login.cookies["token"])
+            for index in range(args.clients):
+                response = await admin.post("/admin/users/add", json={
+                    "first_name": "Investor", "last_name": str(index), "nickname": f"investor{index}",
+                    "email": f"investor{index}@admission.test", "phone": "5550000000", "password": "investor",
+                    "role": "Investor", "country": "MX", "state": "CDMX", "city": "CDMX",
+                })
+                response.raise_for_status()
+
+        await measure(app, args, enabled=False)
+        await measure(app, args, enabled=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./admission_load.db")
+    parser.add_argument("--clients", type=int, default=8, help="well-behaved investors, one address each")
+    parser.add_argument("--abusers", type=int, default=32, help="concurrent login attempts from the flooding address")
+    parser.add_argument("--flood-rate", type=float, default=100, help="login attempts per second the flood aims for")
+    parser.add_argument("--duration", type=float, default=15)
+    args = parser.parse_args()
+
+    os.environ["DB_ADDRESS"] = args.database_url
+    os.environ["EXPIRY_ENABLED"] = "false"
+    os.environ["ARCHIVE_ENABLED"] = "false"
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Endpoint load test for the FastAPI app.
+
+Boots the app from src/main.py in process (or targets a running server with --url),
+optionally seeds the database with the deterministic generator in seeder.py, and drives
+a realistic mix of logins, dashboards, operation listings, make-offer bursts and admin
+user listings from concurrent virtual users. Reports throughput and p50/p95/p99 latency
+per route and saves the run as JSON so it can be compared with a previous commit:
+
+    python benchmarks/load_test.py --database-url sqlite:///./load_test.db --seed-data \\
+        --users 20000 --operations 50000 --bids 200000 --duration 30 --output results.json
+    python benchmarks/load_test.py --database-url sqlite:///./load_test.db --compare results.json
+
+--seed-data drops and recreates the target database, never point it at real data.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTE_MIX = {
+    "POST /token": 5,
+    "GET /investor_dashboard": 10,
+    "GET /operator_dashboard": 5,
+    "GET /api/investor/operations": 30,
+    "GET /api/operator/operations": 15,
+    "GET /investor/operations": 5,
+    "GET /investor/my-bids": 10,
+    "POST /investor/make-offer": 15,
+    "GET /admin/users": 5,
+}
+
+
+def load_generator_module():
+    # The root seeder.py shares its module name with shared/python/seeder.py, so load it by path.
+    spec = importlib.util.spec_from_file_location("data_generator", os.path.join(ROOT, "seeder.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def seed_database(args):
+    from connection import Base, get_engine
+
+    generator_module = load_generator_module()
+    async with get_engine().begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    generator = generator_module.Generator(args.seed, args.users, args.operations, args.bids, 4, date.today())
+    await generator_module.load_all(generator, 10000, False)
+
+
+async def sample_accounts(count: int) -> dict:
+    """Pick generated investors and operators; their password is klimb<index % 4>."""
+    from sqlalchemy import select
+    from connection import SessionLocal
+    from models import User
+
+    accounts = {}
+    async with SessionLocal() as session:
+        for role in ("Investor", "Operator"):
+            result = await session.execute(select(User.email).where(User.role == role).order_by(User.email).limit(count))
+            emails = result.scalars().all()
+            accounts[role] = [(email, f"klimb{int(email.split('@')[0].rsplit('.', 1)[1]) % 4}") for email in emails]
+    accounts["Admin"] = [("admin@admin.com", "admin")]
+    return accounts
+
+
+class VirtualUser:
+    def __init__(self, client, role: str, credentials: tuple, open_operations: list, rng: random.Random):
+        self.client = client
+        self.role = role
+        self.email, self.password = credentials
+        self.open_operations = open_operations
+        self.rng = rng
+        self.token = None
+
+    async def login(self):
+        response = await self.client.post("/token", json={"username": self.email, "password": self.password})
+        self.token = response.cookies.get("token") or self.token
+        return response
+
+    async def call(self, route: str):
+        # An explicit Cookie header keeps each virtual user on its own token instead of the
+        # client's shared jar, which every login overwrites.
+        headers = {"Cookie": f"token={self.token}"} if self.token else {}
+        if route == "POST /token":
+            return await self.login()
+        if route == "POST /investor/make-offer":
+            return await self.client.post("/investor/make-offer", headers=headers, json={
+                "operation_id": self.rng.choice(self.open_operations),
+                "invested_amount": 1,
+                "interest_rate": 10,
+            })
+        method, path = route.split(" ", 1)
+        return await self.client.request(method, path, headers=headers)
+
+
+def role_for(route: str) -> str:
+    if "operator" in route:
+        return "Operator"
+    if "admin" in route:
+        return "Admin"
+    return "Investor"
+
+
+async def drive(client, accounts: dict, open_operations: list, args) -> dict:
+    rng = random.Random(args.seed)
+    routes, weights = zip(*ROUTE_MIX.items())
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    # Answered but turned down (a funded or closed operation, a bad amount): fast, and not the work being measured.
+    rejected = defaultdict(int)
+
+    users = {}
+    for role, credentials in accounts.items():
+        users[role] = [VirtualUser(client, role, item, open_operations, random.Random(rng.random())) for item in credentials]
+        for user in users[role]:
+            await user.login()
+
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(worker_rng):
+        while time.perf_counter() < deadline:
+            route = worker_rng.choices(routes, weights)[0]
+            user = worker_rng.choice(users[role_for(route)])
+            started = time.perf_counter()
+            try:
+                response = await user.call(route)
+                failed = response.status_code >= 500 or response.status_code in (401, 403)
+            except Exception:
+                response, failed = None, True
+            samples[route].append(time.perf_counter() - started)
+            if failed:
+                errors[route] += 1
+            elif 400 <= response.status_code < 500:
+                rejected[route] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(random.Random(rng.random())) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    report = {}
+    for route in routes:
+        latencies = np.asarray(samples[route]) * 1000
+        if not latencies.size:
+            continue
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        report[route] = {
+            "requests": int(latencies.size),
+            "errors": errors[route],
+            "rejected": rejected[route],
+            "throughput_rps": latencies.size / elapsed,
+            "mean_ms": float(latencies.mean()),
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+        }
+    total = sum(item["requests"] for item in report.values())
+    report["ALL"] = {
+        "requests": total,
+        "errors": sum(errors.values()),
+        "rejected": sum(rejected.values()),
+        "throughput_rps": total / elapsed,
+    }
+    return report
+
+
+async def open_operation_ids(client, accounts: dict) -> list:
+    user = VirtualUser(client, "Investor", accounts["Investor"][0], [], random.Random())
+    await user.login()
+    response = await client.get(
+        "/api/investor/operations", params={"limit": 200}, headers={"Cookie": f"token={user.token}"}
+    )
+    return [item["id"] for item in response.json()["items"]]
+
+
+async def run(args) -> dict:
+    import httpx
+
+    if args.seed_data:
+        await seed_database(args)
+    accounts = await sample_accounts(args.accounts)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+        lifespan = None
+    else:
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=60)
+        lifespan = app.router.lifespan_context(app)
+
+    async with client:
+        if lifespan:
+            await lifespan.__aenter__()
+        try:
+            open_operations = await open_operation_ids(client, accounts)
+            if not open_operations:
+                raise SystemExit("The database has no open operations to bid on; run with --seed-data")
+            return await drive(client, accounts, open_operations, args)
+        finally:
+            if lifespan:
+                await lifespan.__aexit__(None, None, None)
+
+
+def print_report(report: dict, baseline: dict = None):
+    print(f"{'route':32} {'req':>7} {'err':>5} {'rej':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, item in report.items():
+        if route == "ALL":
+            continue
+        line = (
+            f"{route:32} {item['requests']:>7} {item['errors']:>5} {item.get('rejected', 0):>5} {item['throughput_rps']:>8.1f} "
+            f"{item['p50_ms']:>8.1f} {item['p95_ms']:>8.1f} {item['p99_ms']:>8.1f}"
+        )
+        if baseline and route in baseline:
+            change = (item["p95_ms"] - baseline[route]["p95_ms"]) / baseline[route]["p95_ms"] * 100
+            line += f"   p95 {change:+.0f}%"
+        print(line)
+    total = report["ALL"]
+    print(f"{'ALL':32} {total['requests']:>7} {total['errors']:>5} {total['rejected']:>5} {total['throughput_rps']:>8.1f}")
+
+
+def regressions(report: dict, baseline: dict, threshold: float) -> list:
+    found = []
+    for route, item in report.items():
+        previous = baseline.get(route)
+        if route == "ALL" or not previous:
+            continue
+        if item["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            found.append(f"{route}: p95 {previous['p95_ms']:.1f}ms -> {item['p95_ms']:.1f}ms")
+    return found
+
+
+def mostly_rejected_offers(report: dict) -> bool:
+    """True when most offers were turned down: their latency would then only measure the 409 path."""
+    offers = report.get("POST /investor/make-offer")
+    return bool(offers) and offers["rejected"] * 2 > offers["requests"]
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="database of the in-process app (defaults to DB_ADDRESS)")
+    parser.add_argument("--url", help="benchmark a running server instead of booting the app in process")
+    parser.add_argument("--seed-data", action="store_true", help="drop, recreate and seed the database first")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--operations", type=int, default=20000)
+    parser.add_argument("--bids", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--accounts", type=int, default=20, help="accounts per role used by virtual users")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="previous results JSON to compare p95 latencies against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95 increase before failing")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DB_ADDRESS"] = args.database_url
+    # The expiry and archive sweeps would close and move the seeded operations while they are being bid on.
+    os.environ.setdefault("EXPIRY_ENABLED", "false")
+    os.environ.setdefault("ARCHIVE_ENABLED", "false")
+    # Every virtual user shares one client address; the limits would measure themselves.
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+
+    report = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)["routes"]
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({
+                "commit": current_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "config": {
+                    name: getattr(args, name)
+                    for name in ("users", "operations", "bids", "seed", "concurrency", "duration", "url")
+                },
+                "routes": report,
+            }, handle, indent=2)
+
+    failed = False
+    if mostly_rejected_offers(report):
+        offers = report["POST /investor/make-offer"]
+        print(f"INVALID RUN {offers['rejected']} of {offers['requests']} offers were rejected")
+        failed = True
+    if baseline:
+        found = regressions(report, baseline, args.threshold)
+        for item in found:
+            print(f"REGRESSION {item}")
+        failed = failed or bool(found)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Speed and correctness of the vectorized return projections.
+
+Builds a synthetic book of --positions bids spread over --investors investors, projects
+it with projections.project under every convention and checks each investor's totals and
+schedule against a plain per-bid Python loop on a sample of the book:
+
+    python benchmarks/return_projections.py --positions 2000000 --investors 50000
+
+No database is needed; the arrays are generated in memory.
+"""
+import argparse
+import math
+import sys
+import time
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+
+from projections import DAY_COUNT_BASES, METHODS, Positions, project
+
+
+def synthetic_book(positions: int, investors: int, as_of: date, seed: int) -> Positions:
+    rng = np.random.default_rng(seed)
+    as_of_day = np.datetime64(as_of, "D")
+    starts = as_of_day - rng.integers(0, 720, positions)
+    return Positions(
+        np.asarray([f"investor-{i:07d}" for i in rng.integers(0, investors, positions)], dtype=object),
+        rng.integers(10_000, 5_000_000, positions),
+        rng.integers(500, 2500, positions) / 10_000,
+        starts,
+        starts + rng.integers(30, 720, positions),
+    )
+
+
+def reference(positions: Positions, as_of: date, method: str, basis: int, sample: set) -> dict:
+    """The same projection, one bid at a time, for the sampled investors."""
+    def interest(principal, rate, days):
+        years = days / basis
+        return principal * ((1 + rate) ** years - 1) if method == "compound" else principal * rate * years
+
+    totals = defaultdict(lambda: {"invested": 0, "accrued": 0.0, "interest": 0.0, "schedule": defaultdict(float)})
+    for i in range(len(positions)):
+        investor = positions.investors[i]
+        if investor not in sample:
+            continue
+        start, maturity = positions.starts[i].item(), positions.maturities[i].item()
+        term = max((maturity - start).days, 0)
+        elapsed = min(max((as_of - start).days, 0), term)
+        principal, rate = int(positions.principal[i]), float(positions.rates[i])
+        item = totals[investor]
+        item["invested"] += principal
+        item["accrued"] += interest(principal, rate, elapsed)
+        item["interest"] += interest(principal, rate, term)
+        if maturity > as_of:
+            item["schedule"][maturity.isoformat()] += principal + interest(principal, rate, term)
+    return totals
+
+
+def check(projections: list, expected: dict) -> list:
+    errors = []
+    for projection in projections:
+        item = expected.get(projection["investor_id"])
+        if item is None:
+            continue
+        pairs = [
+            (projection["invested_amount"], item["invested"] / 100),
+            (projection["accrued_interest"], round(item["accrued"]) / 100),
+            (projection["expected_interest"], round(item["interest"]) / 100),
+        ]
+        schedule = {flow["date"]: flow["payout"] for flow in projection["schedule"]}
+        if schedule.keys() != item["schedule"].keys():
+            errors.append(f"{projection['investor_id']}: schedule days differ")
+        pairs += [(schedule.get(day, 0.0), round(amount) / 100) for day, amount in item["schedule"].items()]
+        # Sums of rounded cents may differ by a cent per position.
+        errors += [
+            f"{projection['investor_id']}: {got} != {want}"
+            for got, want in pairs if not math.isclose(got, want, abs_tol=0.01 * projection["positions"])
+        ]
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, default=1_000_000)
+    parser.add_argument("--investors", type=int, default=20_000)
+    parser.add_argument("--sample", type=int, default=200, help="investors checked against the per-bid loop")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    as_of = date.today()
+    positions = synthetic_book(args.positions, args.investors, as_of, args.seed)
+    sample = set(np.unique(positions.investors)[:args.sample])
+    failed = False
+    for method in METHODS:
+        for basis in DAY_COUNT_BASES:
+            started = time.perf_counter()
+            projections = project(positions, as_of, method, basis)
+            elapsed = time.perf_counter() - started
+            errors = check(projections, reference(positions, as_of, method, basis, sample))
+            failed = failed or bool(errors)
+            print(
+                f"{method:8} actual/{basis}  {len(projections)} investors  {elapsed:.2f}s  "
+                f"{args.positions / elapsed:,.0f} positions/s  {'FAIL' if errors else 'PASS'}"
+            )
+            for error in errors[:5]:
+                print(f"  {error}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,263 @@
+import asyncio
+import logging
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import time
+from contextvars import ContextVar
+from http.cookies import CookieError, SimpleCookie
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 from dotenv import load_dotenv
 
 load_dotenv()
 
-engine = create_engine(os.getenv('DB_ADDRESS'))
-Session = sessionmaker(bind=engine)
-session = Session()
+LOCAL_DB_ADDRESS = "sqlite+aiosqlite:///./klimb.db"
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_SECONDS = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+STICKY_SECONDS = float(os.getenv("DB_STICKY_SECONDS", "5"))
+STICKY_COOKIE = "db_primary_until"
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+logger_info = logging.getLogger(__name__)
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_url(address: str = None):
+    """Return the async driver URL for DB_ADDRESS, falling back to a local SQLite file."""
+    url = make_url(address or os.getenv("DB_ADDRESS") or LOCAL_DB_ADDRESS)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername)
+
+
+def get_engine_options(url) -> dict:
+    """Pool settings for the async engine, configurable through the environment."""
+    options = {"pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"}
+    if url.get_backend_name() == "sqlite":
+        return options
+
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        connect_args={
+            "timeout": float(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+            "command_timeout": float(os.getenv("DB_COMMAND_TIMEOUT", "30")),
+        },
+    )
+    return options
+
+
+def build_engine(address: str = None):
+    url = get_async_url(address)
+    return create_async_engine(url, **get_engine_options(url))
+
+
 Base = declarative_base()
+
+# The engine is built on first use, so importing this module never touches the database.
+_engine = None
+_sessionmaker = None
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = build_engine()
+    return _engine
+
+
+def get_sessionmaker():
+    global _sessionmaker
+    if _sessionmaker is None:
+        _sessionmaker = async_sessionmaker(bind=get_engine(), class_=AsyncSession, expire_on_commit=False)
+    return _sessionmaker
+
+
+def SessionLocal() -> AsyncSession:
+    """New AsyncSession bound to the lazily created engine."""
+    return get_sessionmaker()()
+
+
+# Reads go to DB_REPLICA_ADDRESS when it is set, unless the client wrote recently or the replica lags.
+_replica_engine = None
+_replica_sessionmaker = None
+prefer_primary: ContextVar = ContextVar("prefer_primary", default=False)
+
+
+def get_replica_engine():
+    global _replica_engine
+    address = os.getenv("DB_REPLICA_ADDRESS")
+    if _replica_engine is None and address:
+        _replica_engine = build_engine(address)
+    return _replica_engine
+
+
+def ReadSessionLocal() -> AsyncSession:
+    """New AsyncSession for read-only work: on the replica when it is usable, else on the primary."""
+    global _replica_sessionmaker
+    replica = get_replica_engine()
+    if replica is None or prefer_primary.get() or not replica_monitor.healthy:
+        return SessionLocal()
+    if _replica_sessionmaker is None:
+        _replica_sessionmaker = async_sessionmaker(bind=replica, class_=AsyncSession, expire_on_commit=False)
+    return _replica_sessionmaker()
+
+
+def is_replica_session(session: AsyncSession) -> bool:
+    return session.bind is not None and session.bind is _replica_engine
+
+
+async def measure_replica_lag(engine) -> float:
+    """Seconds the replica is behind the primary; 0 when it has replayed everything it received."""
+    if engine.dialect.name != "postgresql":
+        return 0.0
+    async with engine.connect() as connection:
+        lag = await connection.scalar(text(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        ))
+    return float(lag or 0)
+
+
+class ReplicaMonitor:
+    """Polls the replica lag in the background; reads fall back to the primary while it is too high."""
+
+    def __init__(self, interval: float = REPLICA_CHECK_SECONDS, max_lag: float = REPLICA_MAX_LAG_SECONDS):
+        self.interval = interval
+        self.max_lag = max_lag
+        self.lag = 0.0
+        self.healthy = True
+        self._task = None
+
+    async def check(self):
+        replica = get_replica_engine()
+        if replica is None:
+            return
+        try:
+            self.lag = await measure_replica_lag(replica)
+            healthy = self.lag <= self.max_lag
+        except Exception:
+            logger_info.exception("Could not measure the replica lag")
+            healthy = False
+        if healthy != self.healthy:
+            logger_info.warning("Replica %s (lag %.1fs)", "back in rotation" if healthy else "bypassed", self.lag)
+        self.healthy = healthy
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self._task is None and get_replica_engine() is not None:
+            await self.check()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+replica_monitor = ReplicaMonitor()
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware pinning a client's reads to the primary for DB_STICKY_SECONDS after it writes.
+
+    Successful non-GET requests set a short-lived cookie; while it is valid ReadSessionLocal
+    hands out primary sessions, so the client always sees its own writes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or get_replica_engine() is None:
+            return await self.app(scope, receive, send)
+
+        if scope["method"] in READ_METHODS:
+            token = prefer_primary.set(self._sticky_until(scope) > time.time())
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                prefer_primary.reset(token)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (
+                    f"{STICKY_COOKIE}={time.time() + STICKY_SECONDS:.3f}; "
+                    f"Max-Age={int(STICKY_SECONDS) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        token = prefer_primary.set(True)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            prefer_primary.reset(token)
+
+    @staticmethod
+    def _sticky_until(scope) -> float:
+        for name, value in scope.get("headers", []):
+            if name == b"cookie":
+                try:
+                    morsel = SimpleCookie(value.decode("latin-1")).get(STICKY_COOKIE)
+                    return float(morsel.value) if morsel else 0.0
+                except (CookieError, ValueError):
+                    return 0.0
+        return 0.0
+
+
+async def warm_up(connections: int = None):
+    """Open up to DB_POOL_WARMUP pooled connections concurrently so the first requests skip the handshake."""
+    connections = connections if connections is not None else int(os.getenv("DB_POOL_WARMUP", "4"))
+    engines = [engine for engine in (get_engine(), get_replica_engine()) if engine is not None]
+
+    async def ping(engine):
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(
+        ping(engine)
+        for engine in engines
+        for _ in range(min(connections, 1) if engine.dialect.name == "sqlite" else connections)
+    ))
+
+
+async def dispose_engine():
+    global _engine, _sessionmaker, _replica_engine, _replica_sessionmaker
+    for engine in (_engine, _replica_engine):
+        if engine is not None:
+            await engine.dispose()
+    _engine = None
+    _sessionmaker = None
+    _replica_engine = None
+    _replica_sessionmaker = None
+
+
+async def get_session():
+    """FastAPI dependency that hands out one AsyncSession per request."""
+    async with SessionLocal() as session:
+        yield session
+
+
+async def get_read_session():
+    """Like get_session, for handlers that only read: routed to the replica when possible."""
+    async with ReadSessionLocal() as session:
+        yield session
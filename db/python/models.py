@@ -1,21 +1,25 @@
 from sqlalchemy.sql.functions import now
 from connection import Base
-from sqlalchemy import Column, String, DECIMAL, ForeignKey, Boolean, Date, DateTime
+from sqlalchemy import Column, DDL, JSON, String, DECIMAL, ForeignKey, Boolean, Date, DateTime, Index, Integer, Uuid, event, false, true
 from sqlalchemy.orm import relationship, column_property
 
+# Native uuid on PostgreSQL (16 bytes), CHAR(32) elsewhere; the application keeps exchanging
+# the canonical string form. New keys come from ids.new_id (UUIDv7).
+Key = Uuid(as_uuid=False)
+
 
 class User(Base):
     __tablename__ = 'users'
 
-    id = Column(String, primary_key=True)
+    id = Column(Key, primary_key=True)
     first_name = Column(String)
     last_name = Column(String)
     full_name = column_property(first_name + " " + last_name)
     nickname = Column(String)
-    email = Column(String)
+    email = Column(String, unique=True, index=True)
     phone = Column(String)
     password = Column(String)
-    role = Column(String)
+    role = Column(String, index=True)
     country = Column(String)
     state = Column(String)
     city = Column(String)
@@ -26,8 +30,8 @@ class User(Base):
 class Operation(Base):
     __tablename__ = 'operations'
 
-    id = Column(String, primary_key=True)
-    operator_id = Column(String, ForeignKey('users.id'))
+    id = Column(Key, primary_key=True)
+    operator_id = Column(Key, ForeignKey('users.id'))
     required_amount = Column(DECIMAL(15, 2), nullable=False)
     annual_interest = Column(DECIMAL(5, 2), nullable=False)
     deadline = Column(Date, nullable=False)
@@ -37,15 +41,147 @@ class Operation(Base):
     operator = relationship('User', back_populates='operations')
     bids = relationship('Bid', back_populates='operation')
 
+    __table_args__ = (
+        Index('ix_operations_operator_id_created_at', 'operator_id', 'created_at'),
+        Index(
+            'ix_operations_open_created_at', 'created_at', 'id',
+            postgresql_where=status == true(),
+            sqlite_where=status == true(),
+        ),
+        Index(
+            'ix_operations_open_deadline', 'deadline', 'id',
+            postgresql_where=status == true(),
+            sqlite_where=status == true(),
+        ),
+        # Closed operations waiting for the archive sweep; archiving keeps it small.
+        Index(
+            'ix_operations_closed_deadline', 'deadline', 'id',
+            postgresql_where=status == false(),
+            sqlite_where=status == false(),
+        ),
+    )
+
 
 class Bid(Base):
     __tablename__ = 'bids'
 
-    id = Column(String, primary_key=True)
-    investor_id = Column(String, ForeignKey('users.id'))
-    operation_id = Column(String, ForeignKey('operations.id'))
+    id = Column(Key, primary_key=True)
+    investor_id = Column(Key, ForeignKey('users.id'))
+    operation_id = Column(Key, ForeignKey('operations.id'))
     invested_amount = Column(DECIMAL(15, 2), nullable=False)
     interest_rate = Column(DECIMAL(5, 2), nullable=False)
-    bid_date = Column(DateTime, default=now())
+    # Part of the primary key because PostgreSQL range-partitions the table by it (see partitions.py).
+    bid_date = Column(DateTime, primary_key=True, default=now())
     investor = relationship('User', back_populates='bids')
     operation = relationship('Operation', back_populates='bids')
+
+    __table_args__ = (
+        Index('ix_bids_investor_id_bid_date', 'investor_id', 'bid_date'),
+        Index('ix_bids_operation_id', 'operation_id'),
+        {'postgresql_partition_by': 'RANGE (bid_date)'},
+    )
+    # Ids are unique on their own; the ORM identifies a bid by its id alone.
+    __mapper_args__ = {'primary_key': [id]}
+
+
+# Rows PostgreSQL cannot route to a monthly partition land here instead of failing the insert.
+event.listen(
+    Bid.__table__,
+    'after_create',
+    DDL('CREATE TABLE bids_default PARTITION OF bids DEFAULT').execute_if(dialect='postgresql'),
+)
+
+
+class ArchivedOperation(Base):
+    """Closed operations past their deadline, moved out of the hot tables by archive.py."""
+    __tablename__ = 'archived_operations'
+
+    id = Column(Key, primary_key=True)
+    operator_id = Column(Key, ForeignKey('users.id'), index=True)
+    required_amount = Column(DECIMAL(15, 2), nullable=False)
+    annual_interest = Column(DECIMAL(5, 2), nullable=False)
+    deadline = Column(Date, nullable=False)
+    current_amount = Column(DECIMAL(15, 2))
+    status = Column(Boolean)
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False, default=now())
+    bids = relationship('ArchivedBid', back_populates='operation')
+
+
+class ArchivedBid(Base):
+    """Bids of the archived operations, read on demand by my bids."""
+    __tablename__ = 'archived_bids'
+
+    id = Column(Key, primary_key=True)
+    investor_id = Column(Key, ForeignKey('users.id'))
+    operation_id = Column(Key, ForeignKey('archived_operations.id'))
+    invested_amount = Column(DECIMAL(15, 2), nullable=False)
+    interest_rate = Column(DECIMAL(5, 2), nullable=False)
+    bid_date = Column(DateTime, nullable=False)
+    investor = relationship('User')
+    operation = relationship('ArchivedOperation', back_populates='bids')
+
+    __table_args__ = (
+        Index('ix_archived_bids_investor_id_bid_date', 'investor_id', 'bid_date'),
+        Index('ix_archived_bids_operation_id', 'operation_id'),
+    )
+
+
+class OperatorStats(Base):
+    """Running totals per operator, kept current by the write paths in dashboard_stats."""
+    __tablename__ = 'operator_stats'
+
+    operator_id = Column(Key, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    operations = Column(Integer, nullable=False, default=0)
+    open_operations = Column(Integer, nullable=False, default=0)
+    required_amount = Column(DECIMAL(18, 2), nullable=False, default=0)
+    raised_amount = Column(DECIMAL(18, 2), nullable=False, default=0)
+    open_required_amount = Column(DECIMAL(18, 2), nullable=False, default=0)
+    open_raised_amount = Column(DECIMAL(18, 2), nullable=False, default=0)
+    bids = Column(Integer, nullable=False, default=0)
+    bid_amount = Column(DECIMAL(18, 2), nullable=False, default=0)
+    weighted_rate_sum = Column(DECIMAL(22, 4), nullable=False, default=0)
+
+
+class InvestorStats(Base):
+    """Running totals per investor, kept current by the write paths in dashboard_stats."""
+    __tablename__ = 'investor_stats'
+
+    investor_id = Column(Key, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    bids = Column(Integer, nullable=False, default=0)
+    invested_amount = Column(DECIMAL(18, 2), nullable=False, default=0)
+    weighted_rate_sum = Column(DECIMAL(22, 4), nullable=False, default=0)
+    open_invested_amount = Column(DECIMAL(18, 2), nullable=False, default=0)
+
+
+class OperatorDeadlineStats(Base):
+    """Unfunded amount of each operator's open operations, per deadline day."""
+    __tablename__ = 'operator_deadline_stats'
+
+    operator_id = Column(Key, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    deadline = Column(Date, primary_key=True)
+    open_unfunded_amount = Column(DECIMAL(18, 2), nullable=False, default=0)
+
+
+class InvestorDeadlineStats(Base):
+    """Amount each investor has in open operations, per deadline day."""
+    __tablename__ = 'investor_deadline_stats'
+
+    investor_id = Column(Key, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    deadline = Column(Date, primary_key=True)
+    open_invested_amount = Column(DECIMAL(18, 2), nullable=False, default=0)
+
+
+class UserImportJob(Base):
+    """Progress and row errors of the admin bulk user imports, readable from every worker."""
+    __tablename__ = 'user_import_jobs'
+
+    id = Column(Key, primary_key=True)
+    format = Column(String(10), nullable=False)
+    status = Column(String(20), nullable=False)
+    rows = Column(Integer, nullable=False, default=0)
+    created = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=False, default=list)
+    started_at = Column(DateTime, nullable=False, index=True)
+    finished_at = Column(DateTime)
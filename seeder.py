@@ -1,76 +1,209 @@
 # populate_db.py
-import random
+"""Generador determinista de datos de prueba a gran escala.
+
+Produce usuarios, operaciones y ofertas válidos y referencialmente consistentes a partir
+de una semilla fija, insertándolos en lotes (o con COPY en PostgreSQL):
+
+    python seeder.py --users 1000000 --operations 2000000 --bids 10000000 --seed 42
+
+Cada usuario generado puede iniciar sesión con la contraseña ``klimb<N>``, donde N es
+su índice módulo ``--password-pool``. Las fechas se calculan desde ``--today`` (hoy por
+defecto), así los datos son los mismos para una misma fecha y siempre hay operaciones abiertas.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
 from faker import Faker
+from sqlalchemy import insert
+
+from connection import Base, SessionLocal, dispose_engine, get_engine
+from dashboard_stats import rebuild
+from helpers import get_password_hash
 from models import User, Bid, Operation
-from connection import session
-from decimal import Decimal
 
-# Crear instancia de Faker
-fake = Faker()
-
-# Poblar la base de datos con datos falsos
-def populate_users(n):
-    users = []
-    for _ in range(n):
-        user = User(
-            id=fake.uuid4(),
-            first_name=fake.first_name(),
-            last_name=fake.last_name(),
-            nickname=fake.user_name(),
-            email=fake.email(),
-            phone=fake.phone_number(),
-            role=random.choice(['admin', 'investor', 'operator']),
-            country=fake.country(),
-            state=fake.state(),
-            city=fake.city()
-        )
-        users.append(user)
-        session.add(user)
-
-    session.commit()
-    return users
-
-def populate_operations(users, n):
-    for _ in range(n):
-        user = random.choice(users)
-        operation = Operation(
-            id=fake.uuid4(),
-            operator_id=user.id,
-            required_amount=Decimal(round(random.uniform(1000.00, 10000.00), 2)),  # Convertir a Decimal
-            annual_interest=Decimal(round(random.uniform(5.0, 15.0), 2)),  # Convertir a Decimal
-            deadline=fake.date_between(start_date='today', end_date='+30d'),
-            current_amount=Decimal(0),  # Convertir a Decimal
-            status=random.choice(['Open', 'Closed']),
-        )
-        session.add(operation)
-
-    session.commit()
-
-def populate_bids(users, operations, n):
-    for _ in range(n):
-        user = random.choice(users)
-        operation = random.choice(operations)
-        invested_amount = Decimal(round(random.uniform(100.00, float(operation.required_amount)), 2))  # Asegúrate de que sea un float
-        bid = Bid(
-            id=fake.uuid4(),
-            investor_id=user.id,
-            operation_id=operation.id,
-            invested_amount=invested_amount,  # Ahora esto es un Decimal
-            interest_rate=operation.annual_interest,
+OPERATOR_EVERY = 10
+NAME_POOL_SIZE = 2000
+CENT = Decimal("0.01")
+
+
+class Generator:
+    """Deriva cada fila de su índice, así el mismo --seed produce siempre los mismos datos."""
+
+    def __init__(self, seed: int, users: int, operations: int, bids: int, password_pool: int, today: date):
+        self.seed = seed
+        self.users = users
+        self.operations = operations
+        self.bids = bids
+        self.namespace = uuid.uuid5(uuid.NAMESPACE_OID, f"klimb-seed-{seed}")
+        self.rng = np.random.default_rng(seed)
+        self.today = today
+        self.now = datetime.combine(today, datetime.min.time())
+
+        fake = Faker()
+        Faker.seed(seed)
+        self.first_names = [fake.first_name() for _ in range(NAME_POOL_SIZE)]
+        self.last_names = [fake.last_name() for _ in range(NAME_POOL_SIZE)]
+        self.cities = [(fake.country(), fake.state(), fake.city()) for _ in range(NAME_POOL_SIZE)]
+        self.phones = [fake.numerify("##########") for _ in range(NAME_POOL_SIZE)]
+        # bcrypt es lento a propósito: solo se calculan unos pocos hashes y se reparten.
+        self.password_hashes = [get_password_hash(f"klimb{i}") for i in range(password_pool)]
+
+    def row_id(self, kind: str, index: int) -> str:
+        return str(uuid.uuid5(self.namespace, f"{kind}:{index}"))
+
+    def user_role(self, index: int) -> str:
+        return "Operator" if index % OPERATOR_EVERY == 0 else "Investor"
+
+    def populate_users(self, start: int, stop: int) -> list:
+        picks = np.random.default_rng([self.seed, 1, start]).integers(0, NAME_POOL_SIZE, size=(stop - start, 4))
+        rows = []
+        for offset, (first, last, place, phone) in enumerate(picks):
+            index = start + offset
+            first_name, last_name = self.first_names[first], self.last_names[last]
+            country, state, city = self.cities[place]
+            rows.append({
+                "id": self.row_id("user", index),
+                "first_name": first_name,
+                "last_name": last_name,
+                "nickname": f"{first_name.lower()}{index}",
+                "email": f"{first_name}.{last_name}.{index}@example.com".lower(),
+                "phone": self.phones[phone],
+                "password": self.password_hashes[index % len(self.password_hashes)],
+                "role": self.user_role(index),
+                "country": country,
+                "state": state,
+                "city": city,
+            })
+        return rows
+
+    def plan(self):
+        """Decide las operaciones y ofertas como arreglos, sin exceder nunca el monto requerido."""
+        rng = self.rng
+        operators = max(1, (self.users + OPERATOR_EVERY - 1) // OPERATOR_EVERY)
+        self.operation_operator = rng.integers(0, operators, self.operations) * OPERATOR_EVERY
+        self.required_cents = rng.integers(10, 500, self.operations) * 100_000
+        self.annual_interest = np.round(rng.uniform(5.0, 15.0, self.operations), 2)
+        self.deadline_days = rng.integers(-60, 120, self.operations)
+        self.created_seconds = np.sort(rng.integers(0, 365 * 86400, self.operations))[::-1]
+
+        bid_operation = rng.integers(0, self.operations, self.bids)
+        bid_cents = rng.integers(1, 200, self.bids) * 10_000
+        investor = rng.integers(0, self.users, self.bids)
+        investor += (investor % OPERATOR_EVERY == 0) & (investor + 1 < self.users)
+
+        # Acumulado por operación en orden de llegada; se descartan las ofertas que la sobrefinancian.
+        order = np.argsort(bid_operation, kind="stable")
+        sorted_ops, sorted_cents = bid_operation[order], bid_cents[order]
+        running = np.cumsum(sorted_cents)
+        starts = np.flatnonzero(np.r_[True, sorted_ops[1:] != sorted_ops[:-1]])
+        group_offset = np.repeat(running[starts] - sorted_cents[starts], np.diff(np.r_[starts, len(order)]))
+        accepted = np.zeros(self.bids, dtype=bool)
+        accepted[order] = (running - group_offset) <= self.required_cents[sorted_ops]
+
+        self.bid_operation = bid_operation[accepted]
+        self.bid_cents = bid_cents[accepted]
+        self.bid_investor = investor[accepted]
+        self.bid_rate = np.round(self.annual_interest[self.bid_operation] - rng.uniform(0, 1, accepted.sum()), 2)
+        self.bid_seconds = rng.integers(0, 86400 * 30, accepted.sum())
+        self.current_cents = np.bincount(self.bid_operation, weights=self.bid_cents, minlength=self.operations)
+
+    def populate_operations(self, start: int, stop: int) -> list:
+        rows = []
+        for index in range(start, stop):
+            required = int(self.required_cents[index])
+            current = int(self.current_cents[index])
+            deadline = self.today + timedelta(days=int(self.deadline_days[index]))
+            rows.append({
+                "id": self.row_id("operation", index),
+                "operator_id": self.row_id("user", int(self.operation_operator[index])),
+                "required_amount": Decimal(required) * CENT,
+                "annual_interest": Decimal(str(self.annual_interest[index])),
+                "deadline": deadline,
+                "current_amount": Decimal(current) * CENT,
+                "status": current < required and deadline >= self.today,
+                "created_at": self.now - timedelta(seconds=int(self.created_seconds[index])),
+            })
+        return rows
+
+    def populate_bids(self, start: int, stop: int) -> list:
+        rows = []
+        for index in range(start, stop):
+            operation = int(self.bid_operation[index])
+            created_at = self.now - timedelta(seconds=int(self.created_seconds[operation]))
+            rows.append({
+                "id": self.row_id("bid", index),
+                "investor_id": self.row_id("user", int(self.bid_investor[index])),
+                "operation_id": self.row_id("operation", operation),
+                "invested_amount": Decimal(int(self.bid_cents[index])) * CENT,
+                "interest_rate": Decimal(str(self.bid_rate[index])),
+                "bid_date": created_at + timedelta(seconds=int(self.bid_seconds[index])),
+            })
+        return rows
+
+
+async def bulk_insert(session, model, rows: list, use_copy: bool):
+    if use_copy:
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        columns = list(rows[0])
+        await raw.driver_connection.copy_records_to_table(
+            model.__tablename__, records=[tuple(row[column] for column in columns) for row in rows], columns=columns
         )
-        session.add(bid)
+    else:
+        await session.execute(insert(model), rows)
 
-    session.commit()
 
-if __name__ == "__main__":
-    # Poblar la base de datos
-    num_users = 30
-    num_operations = 100
-    num_bids = 50
+async def load_table(name: str, model, total: int, build_chunk, chunk_size: int, use_copy: bool):
+    started = time.perf_counter()
+    for start in range(0, total, chunk_size):
+        rows = build_chunk(start, min(start + chunk_size, total))
+        # Una transacción por lote: mantiene acotados la memoria y el WAL pendiente.
+        async with SessionLocal() as session:
+            await bulk_insert(session, model, rows, use_copy)
+            await session.commit()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<10} {total:>10} filas en {elapsed:8.1f}s ({total / elapsed if elapsed else 0:,.0f} filas/s)")
 
-    users = populate_users(num_users)
-    populate_operations(users, num_operations)
-    operations = session.query(Operation).all()
-    populate_bids(users, operations, num_bids)
 
-    print(f"Se generaron {num_users} usuarios, {num_operations} operaciones y {num_bids} ofertas.")
+async def load_all(generator: Generator, chunk_size: int, use_copy: bool):
+    generator.plan()
+    await load_table("usuarios", User, generator.users, generator.populate_users, chunk_size, use_copy)
+    await load_table("operaciones", Operation, generator.operations, generator.populate_operations, chunk_size, use_copy)
+    await load_table("ofertas", Bid, len(generator.bid_operation), generator.populate_bids, chunk_size, use_copy)
+    # Los totales de los dashboards se mantienen en cada escritura; una carga masiva los recalcula.
+    async with SessionLocal() as session:
+        await rebuild(session)
+
+
+async def main(args):
+    engine = get_engine()
+    if args.create_schema:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    use_copy = args.copy and engine.dialect.name == "postgresql"
+    generator = Generator(args.seed, args.users, args.operations, args.bids, args.password_pool, args.today)
+    await load_all(generator, args.chunk_size, use_copy)
+    await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--operations", type=int, default=100)
+    parser.add_argument("--bids", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--password-pool", type=int, default=4)
+    parser.add_argument("--today", type=date.fromisoformat, default=date.today(), help="fecha de referencia (AAAA-MM-DD)")
+    parser.add_argument("--copy", action="store_true", help="usar COPY en PostgreSQL")
+    parser.add_argument("--create-schema", action="store_true", help="crear las tablas si no existen")
+    args = parser.parse_args()
+
+    # Poblar la base de datos
+    asyncio.run(main(args))
@@ -0,0 +1,261 @@
+"""Per-client rate limiting and per-worker in-flight caps, applied before a request runs."""
+import json
+import math
+import os
+import time
+from http.cookies import CookieError, SimpleCookie
+
+from jose import JWTError, jwt
+
+from auth import principal_cache
+from cache import TTLCache
+from hashing import HASH_WORKERS
+from helpers import ALGORITHM, SECRET_KEY, logger
+from metrics import ADMISSION_REJECTIONS
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+
+HASHING_ROUTES = {
+    ("POST", "/token"),
+    ("POST", "/register"),
+    ("POST", "/admin/users/add"),
+    ("POST", "/admin/users/import"),
+}
+EXEMPT_PREFIXES = ("/static/", "/metrics")
+# The login is charged to the account it tries, so guessing one password cannot hop addresses.
+LOGIN_ROUTE = ("POST", "/token")
+MAX_LOGIN_BODY = 64 * 1024
+# Long-lived event streams are rate limited when they open but do not count as in flight.
+STREAMING_PREFIXES = ("/events/",)
+
+logger_info = logger()
+
+
+def _rate(name: str, default: str) -> tuple:
+    """Parse a "requests/seconds" budget into (capacity, tokens per second)."""
+    requests, seconds = os.getenv(name, default).split("/")
+    return float(requests), float(requests) / float(seconds)
+
+
+RATE_LIMITS = {
+    "hashing": {"ip": _rate("RATE_LIMIT_HASHING_IP", "10/60"), "user": _rate("RATE_LIMIT_HASHING_USER", "10/60")},
+    "writes": {"ip": _rate("RATE_LIMIT_WRITES_IP", "120/60"), "user": _rate("RATE_LIMIT_WRITES_USER", "60/60")},
+    "reads": {"ip": _rate("RATE_LIMIT_READS_IP", "600/60"), "user": _rate("RATE_LIMIT_READS_USER", "300/60")},
+}
+MAX_IN_FLIGHT = {
+    "hashing": int(os.getenv("ADMISSION_MAX_INFLIGHT_HASHING", str(4 * HASH_WORKERS))),
+    "writes": int(os.getenv("ADMISSION_MAX_INFLIGHT_WRITES", "32")),
+    "reads": int(os.getenv("ADMISSION_MAX_INFLIGHT_READS", "128")),
+}
+
+
+class LocalBuckets:
+    """Token buckets of this process. A bucket left alone until it refills is forgotten."""
+
+    def __init__(self, maxsize: int = RATE_LIMIT_MAX_KEYS):
+        self.buckets = TTLCache(maxsize=maxsize, ttl=math.inf)
+
+    async def take(self, buckets: list) -> float:
+        """Take one token from every (key, capacity, rate) bucket, or from none of them.
+
+        Returns 0 when granted, else the seconds until every bucket has a token again.
+        """
+        now = time.monotonic()
+        refilled = []
+        for key, capacity, rate in buckets:
+            tokens, updated = self.buckets.get(key, (capacity, now))
+            refilled.append((key, capacity, rate, min(capacity, tokens + (now - updated) * rate)))
+        wait = max(((1 - tokens) / rate for _, _, rate, tokens in refilled if tokens < 1), default=0.0)
+        for key, capacity, rate, tokens in refilled:
+            if not wait:
+                tokens -= 1
+            self.buckets.set(key, (tokens, now), (capacity - tokens) / rate)
+        return wait
+
+
+class RedisBuckets:
+    """Token buckets shared by every worker through Redis, updated atomically by a script.
+
+    The script gets one key per bucket and its capacity and rate as consecutive arguments.
+    """
+
+    SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+    levels[i] = tokens
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil((capacity - tokens) / rate * 1000) + 1000)
+end
+return tostring(wait)
+"""
+
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("The redis package is required to use RATE_LIMIT_URL")
+        self._client = redis.from_url(url)
+        self._take = self._client.register_script(self.SCRIPT)
+
+    async def take(self, buckets: list) -> float:
+        keys = [f"klimb:ratelimit:{key}" for key, _, _ in buckets]
+        args = [value for _, capacity, rate in buckets for value in (capacity, rate)]
+        try:
+            return float(await self._take(keys=keys, args=args))
+        except Exception:
+            # An unavailable store must not take the site down with it: admit the request.
+            logger_info.warning("Rate limit store unavailable, admitting request", exc_info=True)
+            return 0.0
+
+
+def get_buckets():
+    url = os.getenv("RATE_LIMIT_URL")
+    return RedisBuckets(url) if url else LocalBuckets()
+
+
+def route_class(method: str, path: str):
+    """hashing, writes or reads; None for the routes that are never limited."""
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    if (method, path.rstrip("/") or "/") in HASHING_ROUTES:
+        return "hashing"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "reads"
+    return "writes"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying the rate limits and in-flight caps of each route class."""
+
+    def __init__(self, app, buckets=None, limits: dict = None, max_in_flight: dict = None):
+        self.app = app
+        self.buckets = buckets or get_buckets()
+        self.limits = limits or RATE_LIMITS
+        self.max_in_flight = max_in_flight or MAX_IN_FLIGHT
+        self.in_flight = dict.fromkeys(self.max_in_flight, 0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+        kind = route_class(scope["method"], scope["path"])
+        if kind is None:
+            return await self.app(scope, receive, send)
+
+        clients = list(self._clients(scope))
+        if (scope["method"], scope["path"].rstrip("/")) == LOGIN_ROUTE:
+            receive, username = await self._login_username(receive)
+            clients = [(scope_name, key) for scope_name, key in clients if scope_name != "user"]
+            if username:
+                clients.append(("user", username))
+
+        # Every bucket is checked before any is charged: a request rejected by the user bucket
+        # must not spend the budget of the address it came from, nor the other way around.
+        wait = await self.buckets.take([
+            (f"{kind}:{scope_name}:{key}", *self.limits[kind][scope_name])
+            for scope_name, key in clients
+        ])
+        if wait > 0:
+            ADMISSION_REJECTIONS.inc(kind, "rate_limited")
+            return await self._reject(send, 429, wait, "Demasiadas solicitudes, intenta de nuevo más tarde.")
+
+        if scope["path"].startswith(STREAMING_PREFIXES):
+            return await self.app(scope, receive, send)
+        if self.in_flight[kind] >= self.max_in_flight[kind]:
+            ADMISSION_REJECTIONS.inc(kind, "overloaded")
+            return await self._reject(send, 503, 1, "El servidor está ocupado, intenta de nuevo en unos segundos.")
+        self.in_flight[kind] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[kind] -= 1
+
+    @staticmethod
+    def _clients(scope):
+        """The (bucket scope, key) pairs the request is charged to."""
+        headers = dict(scope.get("headers", []))
+        client = scope.get("client")
+        address = client[0] if client else "unknown"
+        forwarded = headers.get(b"x-forwarded-for")
+        if RATE_LIMIT_TRUST_FORWARDED and forwarded:
+            address = forwarded.decode("latin-1").split(",")[0].strip()
+        yield "ip", address
+
+        # Only a validly signed token names a user, so nobody can spend someone else's budget.
+        # A token already in the principal cache was verified when it got there.
+        cookie = headers.get(b"cookie")
+        if cookie and b"token=" in cookie:
+            try:
+                morsel = SimpleCookie(cookie.decode("latin-1")).get("token")
+                if morsel is not None:
+                    principal = principal_cache.peek(morsel.value)
+                    if principal is not None:
+                        subject = principal.email
+                    else:
+                        subject = jwt.decode(morsel.value, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+                    if subject:
+                        yield "user", subject.lower()
+            except (CookieError, JWTError):
+                pass
+
+    @staticmethod
+    async def _login_username(receive):
+        """Read the login body for the username it submits and hand back a receive replaying it."""
+        messages, size = [], 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            size += len(message.get("body", b""))
+            if not message.get("more_body") or size > MAX_LOGIN_BODY:
+                break
+
+        username = None
+        if size <= MAX_LOGIN_BODY:
+            try:
+                form = json.loads(b"".join(part.get("body", b"") for part in messages))
+                if isinstance(form, dict) and isinstance(form.get("username"), str):
+                    username = form["username"].strip().lower() or None
+            except ValueError:
+                pass
+
+        async def replay():
+            return messages.pop(0) if messages else await receive()
+
+        return replay, username
+
+    @staticmethod
+    async def _reject(send, status: int, retry_after: float, detail: str):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
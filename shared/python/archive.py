@@ -0,0 +1,123 @@
+"""Moves closed operations past their deadline, with their bids, to the archive tables."""
+import asyncio
+import os
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import delete, false, insert, select
+
+from connection import SessionLocal, dispose_engine
+from helpers import logger
+from locks import leader_lock
+from metrics import ARCHIVE_SWEEPS, ARCHIVE_SWEEP_TIME, OPERATIONS_ARCHIVED
+from models import ArchivedBid, ArchivedOperation, Bid, Operation
+from partitions import ensure_bid_partitions
+from periodic import PeriodicSweep
+from response_cache import listing_cache
+
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "true").lower() == "true"
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "200"))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+
+OPERATION_COLUMNS = [
+    "id", "operator_id", "required_amount", "annual_interest", "deadline", "current_amount", "status", "created_at",
+]
+BID_COLUMNS = ["id", "investor_id", "operation_id", "invested_amount", "interest_rate", "bid_date"]
+
+logger_info = logger()
+
+
+async def archive_batch(cutoff: date, batch_size: int = ARCHIVE_BATCH_SIZE) -> list:
+    """Move up to batch_size closed operations with a deadline before cutoff, and their bids, in one transaction."""
+    async with SessionLocal() as session:
+        ids = (await session.scalars(
+            select(Operation.id)
+            .where(Operation.status == false(), Operation.deadline < cutoff)
+            .order_by(Operation.deadline, Operation.id)
+            .limit(batch_size)
+            # Rows being reopened by their operator are left for the next sweep.
+            .with_for_update(skip_locked=True)
+        )).all()
+        if not ids:
+            return []
+
+        await session.execute(insert(ArchivedOperation).from_select(
+            OPERATION_COLUMNS,
+            select(*(Operation.__table__.c[name] for name in OPERATION_COLUMNS)).where(Operation.id.in_(ids)),
+        ))
+        await session.execute(insert(ArchivedBid).from_select(
+            BID_COLUMNS,
+            select(*(Bid.__table__.c[name] for name in BID_COLUMNS)).where(Bid.operation_id.in_(ids)),
+        ))
+        await session.execute(
+            delete(Bid).where(Bid.operation_id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        await session.execute(
+            delete(Operation).where(Operation.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    return ids
+
+
+class ArchiveScheduler(PeriodicSweep):
+    """Keeps the bid partitions ahead and archives closed operations; one worker at a time sweeps."""
+
+    description = "Operation archive sweep"
+    sweeps = ARCHIVE_SWEEPS
+
+    def __init__(
+        self,
+        interval: float = ARCHIVE_INTERVAL_SECONDS,
+        batch_size: int = ARCHIVE_BATCH_SIZE,
+        after_days: int = ARCHIVE_AFTER_DAYS,
+    ):
+        super().__init__(interval)
+        self.batch_size = batch_size
+        self.after_days = after_days
+
+    async def sweep(self) -> int:
+        """Archive batch by batch until nothing is left; returns how many operations were moved."""
+        created = await ensure_bid_partitions()
+        if created:
+            logger_info.info("Created bid partitions %s", ", ".join(created))
+
+        async with leader_lock("operation-archive") as leader:
+            if not leader:
+                ARCHIVE_SWEEPS.inc("skipped")
+                return 0
+
+            started = time.perf_counter()
+            cutoff = date.today() - timedelta(days=self.after_days)
+            total = 0
+            while True:
+                archived = await archive_batch(cutoff, self.batch_size)
+                total += len(archived)
+                if len(archived) < self.batch_size:
+                    break
+            if total:
+                # Operators' listings include their closed operations.
+                await listing_cache.invalidate("operations")
+
+            elapsed = time.perf_counter() - started
+            ARCHIVE_SWEEPS.inc("completed")
+            ARCHIVE_SWEEP_TIME.observe(elapsed)
+            OPERATIONS_ARCHIVED.inc(amount=total)
+            self.last_sweep = {"at": time.time(), "archived": total, "seconds": elapsed}
+            if total:
+                logger_info.info("Archived %d operations in %.0fms", total, elapsed * 1000)
+            return total
+
+
+archive_scheduler = ArchiveScheduler()
+
+
+async def main():
+    try:
+        print(f"Archived {await archive_scheduler.sweep()} operations")
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
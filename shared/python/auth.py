@@ -1,12 +1,73 @@
+import os
+import time
+
 from fastapi import HTTPException, status
-from models import User
-from connection import session
+from jose import jwt
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from cache import TTLCache
+from connection import SessionLocal, is_replica_session
+from events import event_hub
 from helpers import get_current_user
+from models import User
 
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "300")),
+)
 
-async def authenticate_user(token: str):
+
+async def authenticate_user(session: AsyncSession, token: str):
     """Authenticate user and return user details."""
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    user = get_current_user(token)
-    return user
\ No newline at end of file
+
+    user = principal_cache.get(token)
+    if user is not None:
+        return user
+
+    if is_replica_session(session):
+        # A lagging replica could hand back a user that was just deleted or demoted, and the
+        # cache would keep it after the invalidation: principals are read from the primary.
+        async with SessionLocal() as primary:
+            user = await get_current_user(primary, token)
+    else:
+        user = await get_current_user(session, token)
+    expires_at = jwt.get_unverified_claims(token).get("exp")
+    principal_cache.set(token, user, ttl=expires_at - time.time() if expires_at else None)
+    return user
+
+
+PRINCIPAL_INVALIDATED = "principal.invalidated"
+
+
+def invalidate_user(user_id: str):
+    """Forget every cached token that resolves to the given user."""
+    return principal_cache.invalidate_where(lambda user: user.id == user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_principal(mapper, connection, target):
+    # Deleted users and role changes must not keep authenticating from the cache.
+    invalidate_user(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("invalidated_users", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _share_invalidated_principals(session):
+    # Once committed, so that no worker can cache the old row again after forgetting it.
+    for user_id in session.info.pop("invalidated_users", ()):
+        invalidate_user(user_id)
+        event_hub.share_soon(PRINCIPAL_INVALIDATED, {"user_id": user_id})
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_invalidated_principals(session):
+    session.info.pop("invalidated_users", None)
+
+
+event_hub.on(PRINCIPAL_INVALIDATED, lambda payload: invalidate_user(payload["user_id"]))
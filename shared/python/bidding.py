@@ -0,0 +1,91 @@
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dashboard_stats import record_bid
+from ids import new_id
+from models import Bid, Operation
+
+CENT = Decimal("0.01")
+
+
+def to_amount(value) -> Decimal:
+    return Decimal(str(value)).quantize(CENT)
+
+
+async def place_bid(
+    session: AsyncSession,
+    investor_id: str,
+    operation_id: str,
+    invested_amount,
+    interest_rate,
+) -> dict:
+    """Reserve funding on the operation and record the bid in one transaction.
+
+    The reservation is a single conditional UPDATE, so concurrent bidders can never push
+    current_amount past required_amount: the database re-checks the WHERE clause against
+    the row version it locks. The operation closes itself when it becomes fully funded.
+    """
+    amount = to_amount(invested_amount)
+    if amount <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El monto invertido debe ser mayor a cero.")
+
+    funded = func.coalesce(Operation.current_amount, 0) + amount
+    reserve = (
+        update(Operation)
+        .where(
+            Operation.id == operation_id,
+            Operation.status == True,
+            funded <= Operation.required_amount,
+        )
+        .values(
+            current_amount=funded,
+            status=case((funded >= Operation.required_amount, False), else_=Operation.status),
+        )
+        .returning(
+            Operation.current_amount,
+            Operation.required_amount,
+            Operation.status,
+            Operation.operator_id,
+            Operation.deadline,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    reserved = (await session.execute(reserve)).first()
+
+    if reserved is None:
+        await session.rollback()
+        operation = await session.get(Operation, operation_id)
+        if not operation:
+            raise HTTPException(status_code=404, detail="Operation not found")
+        if not operation.status:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="La operación ya está cerrada.")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="El monto supera lo que falta por financiar en la operación.",
+        )
+
+    bid = Bid(
+        id=new_id(),
+        investor_id=investor_id,
+        operation_id=operation_id,
+        invested_amount=amount,
+        interest_rate=to_amount(interest_rate),
+        bid_date=datetime.now(),
+    )
+    session.add(bid)
+    closed_operation = None
+    if not reserved.status:
+        closed_operation = {"required_amount": reserved.required_amount, "current_amount": reserved.current_amount}
+    await record_bid(session, bid, reserved.operator_id, reserved.deadline, closed_operation)
+    await session.commit()
+
+    return {
+        "bid": bid,
+        "current_amount": reserved.current_amount,
+        "required_amount": reserved.required_amount,
+        "status": reserved.status,
+    }
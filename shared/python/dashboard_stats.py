@@ -0,0 +1,362 @@
+"""Per-operator and per-investor dashboard totals, kept up to date incrementally."""
+import asyncio
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, case, delete, func, insert, literal, select, true, union_all, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from connection import SessionLocal, dispose_engine
+from models import (
+    ArchivedBid,
+    ArchivedOperation,
+    Bid,
+    InvestorDeadlineStats,
+    InvestorStats,
+    Operation,
+    OperatorDeadlineStats,
+    OperatorStats,
+)
+
+# Amount at risk by deadline: each bucket takes the deadlines before today plus its days that no
+# earlier bucket took, and "later" the rest.
+AT_RISK_BUCKETS = (("overdue", 0), ("next_7_days", 8), ("next_30_days", 31))
+
+
+async def _increment(session: AsyncSession, model, key: dict, **amounts):
+    """Add the amounts to the row identified by key, creating it on first use."""
+    await _increment_many(session, model, list(key), [{**key, **amounts}])
+
+
+async def _increment_many(session: AsyncSession, model, key_names: list, rows: list):
+    """Like _increment for many rows at once; every row carries its key and the same amount columns."""
+    if not rows:
+        return
+    connection = await session.connection()
+    dialect_insert = postgresql_insert if connection.dialect.name == "postgresql" else sqlite_insert
+    table = model.__table__
+    statement = dialect_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=key_names,
+        set_={name: table.c[name] + statement.excluded[name] for name in rows[0] if name not in key_names},
+    )
+    await session.execute(statement, rows)
+
+
+async def _shift_open_investments(session: AsyncSession, operation_ids: list, sign: int):
+    """Move the bids of the operations in or out of their investors' open exposure."""
+    result = await session.execute(
+        select(Bid.investor_id, Operation.deadline, func.sum(Bid.invested_amount))
+        .join(Bid.operation)
+        .where(Bid.operation_id.in_(operation_ids), Bid.investor_id.is_not(None))
+        .group_by(Bid.investor_id, Operation.deadline)
+    )
+    per_deadline = [
+        {"investor_id": investor_id, "deadline": deadline, "open_invested_amount": sign * amount}
+        for investor_id, deadline, amount in result
+    ]
+    per_investor = {}
+    for row in per_deadline:
+        per_investor[row["investor_id"]] = per_investor.get(row["investor_id"], 0) + row["open_invested_amount"]
+    # Upserted like every other total: an investor without a stats row yet must not be skipped.
+    await _increment_many(
+        session,
+        InvestorStats,
+        ["investor_id"],
+        [{"investor_id": investor_id, "open_invested_amount": amount} for investor_id, amount in per_investor.items()],
+    )
+    await _increment_many(session, InvestorDeadlineStats, ["investor_id", "deadline"], per_deadline)
+
+
+async def record_operation_created(session: AsyncSession, operation: Operation):
+    current = operation.current_amount or 0
+    await _increment(
+        session,
+        OperatorStats,
+        {"operator_id": operation.operator_id},
+        operations=1,
+        open_operations=1,
+        required_amount=operation.required_amount,
+        raised_amount=current,
+        open_required_amount=operation.required_amount,
+        open_raised_amount=current,
+    )
+    await _increment(
+        session,
+        OperatorDeadlineStats,
+        {"operator_id": operation.operator_id, "deadline": operation.deadline},
+        open_unfunded_amount=operation.required_amount - current,
+    )
+
+
+async def record_bid(
+    session: AsyncSession, bid: Bid, operator_id: str, deadline: date, closed_operation: dict = None
+):
+    """Account a bid; closed_operation holds required and current amounts when the bid fully funded it."""
+    weighted = bid.invested_amount * bid.interest_rate
+    await _increment(
+        session,
+        OperatorStats,
+        {"operator_id": operator_id},
+        raised_amount=bid.invested_amount,
+        open_raised_amount=bid.invested_amount,
+        bids=1,
+        bid_amount=bid.invested_amount,
+        weighted_rate_sum=weighted,
+    )
+    await _increment(
+        session,
+        InvestorStats,
+        {"investor_id": bid.investor_id},
+        bids=1,
+        invested_amount=bid.invested_amount,
+        weighted_rate_sum=weighted,
+        open_invested_amount=bid.invested_amount,
+    )
+    await _increment(
+        session,
+        OperatorDeadlineStats,
+        {"operator_id": operator_id, "deadline": deadline},
+        open_unfunded_amount=-bid.invested_amount,
+    )
+    await _increment(
+        session,
+        InvestorDeadlineStats,
+        {"investor_id": bid.investor_id, "deadline": deadline},
+        open_invested_amount=bid.invested_amount,
+    )
+    if closed_operation is not None:
+        await record_status_change(session, bid.operation_id, operator_id, False, deadline=deadline, **closed_operation)
+
+
+async def record_status_change(
+    session: AsyncSession,
+    operation_id: str,
+    operator_id: str,
+    is_open: bool,
+    required_amount,
+    current_amount,
+    deadline: date,
+):
+    """Move an operation, and the bids placed on it, between the open and closed totals."""
+    sign = 1 if is_open else -1
+    await _increment(
+        session,
+        OperatorStats,
+        {"operator_id": operator_id},
+        open_operations=sign,
+        open_required_amount=sign * required_amount,
+        open_raised_amount=sign * (current_amount or 0),
+    )
+    await _increment(
+        session,
+        OperatorDeadlineStats,
+        {"operator_id": operator_id, "deadline": deadline},
+        open_unfunded_amount=sign * (required_amount - (current_amount or 0)),
+    )
+    await _shift_open_investments(session, [operation_id], sign)
+
+
+async def record_operations_closed(session: AsyncSession, operations: list):
+    """Close many operations at once; each item has id, operator_id, required_amount, current_amount and deadline."""
+    per_operator = {}
+    per_deadline = {}
+    for operation in operations:
+        if operation.operator_id is None:
+            continue
+        totals = per_operator.setdefault(operation.operator_id, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += operation.required_amount
+        totals[2] += operation.current_amount or 0
+        key = (operation.operator_id, operation.deadline)
+        per_deadline[key] = per_deadline.get(key, 0) - (operation.required_amount - (operation.current_amount or 0))
+    for operator_id, (count, required, current) in per_operator.items():
+        await _increment(
+            session,
+            OperatorStats,
+            {"operator_id": operator_id},
+            open_operations=-count,
+            open_required_amount=-required,
+            open_raised_amount=-current,
+        )
+    await _increment_many(
+        session,
+        OperatorDeadlineStats,
+        ["operator_id", "deadline"],
+        [
+            {"operator_id": operator_id, "deadline": deadline, "open_unfunded_amount": amount}
+            for (operator_id, deadline), amount in per_deadline.items()
+        ],
+    )
+    await _shift_open_investments(session, [operation.id for operation in operations], -1)
+
+
+async def _at_risk_by_deadline(session: AsyncSession, amount, owner, owner_id: str) -> dict:
+    """Sum an open amount kept per deadline day into the AT_RISK_BUCKETS, relative to today."""
+    today = date.today()
+    deadline = amount.class_.deadline
+    bucket = case(
+        *((deadline < today + timedelta(days=days), name) for name, days in AT_RISK_BUCKETS),
+        else_="later",
+    )
+    totals = dict.fromkeys([name for name, _ in AT_RISK_BUCKETS] + ["later"], 0.0)
+    rows = await session.execute(select(bucket, func.sum(amount)).where(owner == owner_id).group_by(bucket))
+    for name, total in rows:
+        totals[name] = float(total)
+    return totals
+
+
+async def get_operator_stats(session: AsyncSession, operator_id: str) -> dict:
+    stats = await session.get(OperatorStats, operator_id)
+    if stats is None:
+        stats = OperatorStats(
+            operations=0, open_operations=0, required_amount=0, raised_amount=0, open_required_amount=0,
+            open_raised_amount=0, bids=0, bid_amount=0, weighted_rate_sum=0,
+        )
+    return {
+        "operations": stats.operations,
+        "open_operations": stats.open_operations,
+        "bids": stats.bids,
+        "required_amount": float(stats.required_amount),
+        "raised_amount": float(stats.raised_amount),
+        "funding_ratio": float(stats.raised_amount / stats.required_amount) if stats.required_amount else 0.0,
+        "average_rate": float(stats.weighted_rate_sum / stats.bid_amount) if stats.bid_amount else 0.0,
+        "open_unfunded_amount": float(stats.open_required_amount - stats.open_raised_amount),
+        "at_risk_by_deadline": await _at_risk_by_deadline(
+            session, OperatorDeadlineStats.open_unfunded_amount, OperatorDeadlineStats.operator_id, operator_id
+        ),
+    }
+
+
+async def get_investor_stats(session: AsyncSession, investor_id: str) -> dict:
+    stats = await session.get(InvestorStats, investor_id)
+    if stats is None:
+        stats = InvestorStats(bids=0, invested_amount=0, weighted_rate_sum=0, open_invested_amount=0)
+    return {
+        "bids": stats.bids,
+        "invested_amount": float(stats.invested_amount),
+        "average_rate": float(stats.weighted_rate_sum / stats.invested_amount) if stats.invested_amount else 0.0,
+        "open_invested_amount": float(stats.open_invested_amount),
+        "at_risk_by_deadline": await _at_risk_by_deadline(
+            session, InvestorDeadlineStats.open_invested_amount, InvestorDeadlineStats.investor_id, investor_id
+        ),
+    }
+
+
+def _all_operations():
+    """Hot and archived operations; the archive only holds closed ones."""
+    def columns(model):
+        return select(model.id, model.operator_id, model.required_amount, model.current_amount, model.status)
+    return union_all(columns(Operation), columns(ArchivedOperation)).subquery()
+
+
+def _all_bids():
+    def columns(model):
+        return select(model.id, model.investor_id, model.operation_id, model.invested_amount, model.interest_rate)
+    return union_all(columns(Bid), columns(ArchivedBid)).subquery()
+
+
+async def rebuild(session: AsyncSession):
+    """Recompute both tables from scratch in one transaction."""
+    operations, bids = _all_operations(), _all_bids()
+    bids_with_operation = bids.join(operations, operations.c.id == bids.c.operation_id)
+    is_open = operations.c.status == true()
+    current = func.coalesce(operations.c.current_amount, 0)
+    for model in (OperatorStats, InvestorStats, OperatorDeadlineStats, InvestorDeadlineStats):
+        await session.execute(delete(model))
+
+    await session.execute(
+        insert(OperatorStats).from_select(
+            [
+                "operator_id", "operations", "open_operations", "required_amount", "raised_amount",
+                "open_required_amount", "open_raised_amount", "bids", "bid_amount", "weighted_rate_sum",
+            ],
+            select(
+                operations.c.operator_id,
+                func.count(),
+                func.sum(case((is_open, 1), else_=0)),
+                func.sum(operations.c.required_amount),
+                func.sum(current),
+                func.sum(case((is_open, operations.c.required_amount), else_=0)),
+                func.sum(case((is_open, current), else_=0)),
+                literal(0), literal(0), literal(0),
+            )
+            .where(operations.c.operator_id.is_not(None))
+            .group_by(operations.c.operator_id),
+        )
+    )
+    # One row per operator, so the bid totals are merged with an executemany.
+    bid_totals = await session.execute(
+        select(
+            operations.c.operator_id,
+            func.count(bids.c.id),
+            func.sum(bids.c.invested_amount),
+            func.sum(bids.c.invested_amount * bids.c.interest_rate),
+        )
+        .select_from(bids_with_operation)
+        .group_by(operations.c.operator_id)
+    )
+    rows = [
+        {"b_operator_id": operator_id, "b_bids": count, "b_amount": amount, "b_weighted": weighted}
+        for operator_id, count, amount, weighted in bid_totals
+        if operator_id is not None
+    ]
+    if rows:
+        table = OperatorStats.__table__
+        await session.execute(
+            update(table)
+            .where(table.c.operator_id == bindparam("b_operator_id"))
+            .values(bids=bindparam("b_bids"), bid_amount=bindparam("b_amount"), weighted_rate_sum=bindparam("b_weighted")),
+            rows,
+        )
+
+    await session.execute(
+        insert(InvestorStats).from_select(
+            ["investor_id", "bids", "invested_amount", "weighted_rate_sum", "open_invested_amount"],
+            select(
+                bids.c.investor_id,
+                func.count(bids.c.id),
+                func.sum(bids.c.invested_amount),
+                func.sum(bids.c.invested_amount * bids.c.interest_rate),
+                func.sum(case((is_open, bids.c.invested_amount), else_=0)),
+            )
+            .select_from(bids_with_operation)
+            .where(bids.c.investor_id.is_not(None))
+            .group_by(bids.c.investor_id),
+        )
+    )
+
+    # Only open operations are at risk, and the archive holds closed ones only.
+    await session.execute(
+        insert(OperatorDeadlineStats).from_select(
+            ["operator_id", "deadline", "open_unfunded_amount"],
+            select(
+                Operation.operator_id,
+                Operation.deadline,
+                func.sum(Operation.required_amount - func.coalesce(Operation.current_amount, 0)),
+            )
+            .where(Operation.status == true(), Operation.operator_id.is_not(None))
+            .group_by(Operation.operator_id, Operation.deadline),
+        )
+    )
+    await session.execute(
+        insert(InvestorDeadlineStats).from_select(
+            ["investor_id", "deadline", "open_invested_amount"],
+            select(Bid.investor_id, Operation.deadline, func.sum(Bid.invested_amount))
+            .join(Bid.operation)
+            .where(Operation.status == true(), Bid.investor_id.is_not(None))
+            .group_by(Bid.investor_id, Operation.deadline),
+        )
+    )
+    await session.commit()
+
+
+async def main():
+    async with SessionLocal() as session:
+        await rebuild(session)
+    await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
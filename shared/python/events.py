@@ -0,0 +1,220 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import defaultdict
+
+from helpers import logger
+
+logger_info = logger()
+
+EVENTS_CHANNEL = "klimb:operations"
+SUBSCRIBER_QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+RECONNECT_MIN_SECONDS = 1
+RECONNECT_MAX_SECONDS = 30
+
+
+class LocalBackend:
+    """Delivers events only inside this process. Used by default and in tests."""
+
+    def __init__(self):
+        self._deliver = None
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    async def publish(self, message: str):
+        self._deliver(message)
+
+    async def stop(self):
+        self._deliver = None
+
+
+class RedisBackend:
+    """Shares events between workers through a Redis pub/sub channel."""
+
+    def __init__(self, url: str, channel: str = EVENTS_CHANNEL):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("The redis package is required to use EVENTS_BACKEND_URL")
+        self._client = redis.from_url(url)
+        self._channel = channel
+        self._listener = None
+
+    async def start(self, deliver):
+        pubsub = self._client.pubsub()
+        await pubsub.subscribe(self._channel)
+        self._listener = asyncio.create_task(self._listen(pubsub, deliver))
+
+    async def _listen(self, pubsub, deliver):
+        """Deliver every message of the channel, resubscribing with backoff when the connection drops."""
+        delay = RECONNECT_MIN_SECONDS
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = self._client.pubsub()
+                    await pubsub.subscribe(self._channel)
+                    logger_info.info("Resubscribed to the events channel")
+                delay = RECONNECT_MIN_SECONDS
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        deliver(message["data"].decode())
+                    except Exception:
+                        # One bad message must not stop the events of every dashboard.
+                        logger_info.exception("Could not deliver an event")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger_info.warning("Lost the events channel, retrying in %.0fs", delay, exc_info=True)
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+                pubsub = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    async def publish(self, message: str):
+        await self._client.publish(self._channel, message)
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+        await self._client.aclose()
+
+
+def get_backend():
+    url = os.getenv("EVENTS_BACKEND_URL")
+    return RedisBackend(url) if url else LocalBackend()
+
+
+class EventHub:
+    """Fans published operation events out to every subscribed dashboard.
+
+    It also carries internal events between workers: state kept in each process, such as
+    the order books and the principal cache, registers a handler with on() and sends its
+    changes with share(). Internal events reach the handlers of the other workers only and
+    are never streamed to dashboards.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or LocalBackend()
+        self.subscribers = set()
+        self.published = 0
+        self.handlers = defaultdict(list)
+        self.origin = None
+        self._tasks = set()
+
+    async def start(self):
+        # Set in every worker: the hub itself is created before serve.py forks.
+        self.origin = uuid.uuid4().hex
+        await self.backend.start(self._deliver)
+
+    async def stop(self):
+        await self.backend.stop()
+
+    async def publish(self, event_type: str, payload: dict):
+        self.published += 1
+        try:
+            await self.backend.publish(json.dumps({"type": event_type, "data": payload}))
+        except Exception:
+            logger_info.exception("Could not publish %s event", event_type)
+
+    def on(self, event_type: str, handler):
+        """Call handler(payload) for the internal events of this type shared by other workers.
+
+        A handler may return a coroutine; it then runs in a background task.
+        """
+        self.handlers[event_type].append(handler)
+
+    async def share(self, event_type: str, payload: dict):
+        """Send an internal event to the other workers; the caller already applied it here."""
+        if self.origin is None:
+            # Not started: a script or test using the app without its lifespan, alone in its process.
+            return
+        try:
+            await self.backend.publish(json.dumps({"type": event_type, "data": payload, "origin": self.origin}))
+        except Exception:
+            logger_info.exception("Could not share %s event", event_type)
+
+    def share_soon(self, event_type: str, payload: dict):
+        """share() from synchronous code, such as ORM event listeners, running in the event loop."""
+        try:
+            self._track(asyncio.get_running_loop().create_task(self.share(event_type, payload)))
+        except RuntimeError:
+            # No event loop: a command line tool, whose changes no worker has cached.
+            pass
+
+    def _track(self, task: asyncio.Task):
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger_info.error("Event handler failed", exc_info=task.exception())
+
+    def _deliver(self, message: str):
+        event = json.loads(message)
+        if "origin" in event:
+            if event["origin"] != self.origin:
+                self._handle(event["type"], event["data"])
+            return
+        # Encode the SSE frame once, whatever the number of subscribers.
+        frame = f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+        for queue in self.subscribers:
+            if queue.full():
+                # A slow dashboard loses its oldest event instead of stalling everyone else.
+                queue.get_nowait()
+            queue.put_nowait(frame)
+
+    def _handle(self, event_type: str, payload: dict):
+        for handler in self.handlers.get(event_type, ()):
+            try:
+                result = handler(payload)
+                if asyncio.iscoroutine(result):
+                    self._track(asyncio.create_task(result))
+            except Exception:
+                logger_info.exception("Event handler for %s failed", event_type)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    async def stream(self, request):
+        """Server-Sent Events stream for one client, ending when it disconnects."""
+        queue = self.subscribe()
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+
+def operation_payload(operation) -> dict:
+    return {
+        "id": operation.id,
+        "operator_id": operation.operator_id,
+        "required_amount": float(operation.required_amount),
+        "annual_interest": float(operation.annual_interest),
+        "current_amount": float(operation.current_amount or 0),
+        "status": operation.status,
+        "deadline": operation.deadline.isoformat(),
+        "created_at": operation.created_at.isoformat() if operation.created_at else None,
+    }
+
+
+event_hub = EventHub(get_backend())
@@ -0,0 +1,94 @@
+import os
+import time
+from datetime import date
+
+from sqlalchemy import select, true, update
+
+from connection import SessionLocal
+from dashboard_stats import record_operations_closed
+from events import event_hub
+from helpers import logger
+from locks import leader_lock
+from metrics import EXPIRY_SWEEPS, EXPIRY_SWEEP_TIME, OPERATIONS_EXPIRED
+from models import Operation
+from order_book import order_books
+from periodic import PeriodicSweep
+from response_cache import listing_cache
+
+EXPIRY_ENABLED = os.getenv("EXPIRY_ENABLED", "true").lower() == "true"
+EXPIRY_INTERVAL_SECONDS = float(os.getenv("EXPIRY_INTERVAL_SECONDS", "60"))
+EXPIRY_BATCH_SIZE = int(os.getenv("EXPIRY_BATCH_SIZE", "500"))
+
+logger_info = logger()
+
+
+async def expire_batch(today: date, batch_size: int = EXPIRY_BATCH_SIZE) -> list:
+    """Close up to batch_size open operations whose deadline is before today, in one UPDATE."""
+    expired = (
+        select(Operation.id)
+        .where(Operation.status == true(), Operation.deadline < today)
+        .order_by(Operation.deadline, Operation.id)
+        .limit(batch_size)
+        # Rows locked by a concurrent bid are left for the next batch instead of waiting on them.
+        .with_for_update(skip_locked=True)
+    )
+    close = (
+        update(Operation)
+        .where(Operation.id.in_(expired.scalar_subquery()), Operation.status == true())
+        .values(status=False)
+        .returning(
+            Operation.id, Operation.operator_id, Operation.required_amount, Operation.current_amount, Operation.deadline
+        )
+        .execution_options(synchronize_session=False)
+    )
+    async with SessionLocal() as session:
+        closed = (await session.execute(close)).all()
+        if closed:
+            await record_operations_closed(session, closed)
+        await session.commit()
+    return closed
+
+
+class ExpiryScheduler(PeriodicSweep):
+    """Periodically closes operations past their deadline; one worker at a time does the sweep."""
+
+    description = "Operation expiry sweep"
+    sweeps = EXPIRY_SWEEPS
+
+    def __init__(self, interval: float = EXPIRY_INTERVAL_SECONDS, batch_size: int = EXPIRY_BATCH_SIZE):
+        super().__init__(interval)
+        self.batch_size = batch_size
+
+    async def sweep(self) -> int:
+        """Expire operations batch by batch until none are left; returns how many were closed."""
+        async with leader_lock("operation-expiry") as leader:
+            if not leader:
+                EXPIRY_SWEEPS.inc("skipped")
+                return 0
+
+            started = time.perf_counter()
+            today = date.today()
+            total = 0
+            while True:
+                closed = await expire_batch(today, self.batch_size)
+                if not closed:
+                    break
+                total += len(closed)
+                ids = [operation.id for operation in closed]
+                await order_books.share_change("close", operation_ids=ids)
+                await listing_cache.invalidate("operations")
+                await event_hub.publish("operations.expired", {"ids": ids})
+                if len(closed) < self.batch_size:
+                    break
+
+            elapsed = time.perf_counter() - started
+            EXPIRY_SWEEPS.inc("completed")
+            EXPIRY_SWEEP_TIME.observe(elapsed)
+            OPERATIONS_EXPIRED.inc(amount=total)
+            self.last_sweep = {"at": time.time(), "expired": total, "seconds": elapsed}
+            if total:
+                logger_info.info("Expired %d operations in %.0fms", total, elapsed * 1000)
+            return total
+
+
+expiry_scheduler = ExpiryScheduler()
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from connection import ReadSessionLocal
+from models import User, Operation, Bid
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = {
+    "users": (
+        User.id, User.first_name, User.last_name, User.nickname, User.email,
+        User.phone, User.role, User.country, User.state, User.city,
+    ),
+    "operations": (
+        Operation.id, Operation.operator_id, Operation.required_amount, Operation.annual_interest,
+        Operation.deadline, Operation.current_amount, Operation.status, Operation.created_at,
+    ),
+    "bids": (
+        Bid.id, Bid.investor_id, Bid.operation_id, Bid.invested_amount,
+        Bid.interest_rate, Bid.bid_date,
+    ),
+}
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _serialize(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+async def _stream_rows(query, columns, fmt: str):
+    # The header goes out before the query runs so the client sees bytes immediately.
+    if fmt == "csv":
+        yield _csv_line(column.key for column in columns)
+
+    # The request session is closed once the handler returns, so the stream owns its own.
+    async with ReadSessionLocal() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            chunk = []
+            for row in rows:
+                values = [_serialize(value) for value in row]
+                if fmt == "csv":
+                    chunk.append(_csv_line(values))
+                else:
+                    record = dict(zip((column.key for column in columns), values))
+                    chunk.append(json.dumps(record) + "\n")
+            yield "".join(chunk)
+
+
+def export_query(name: str):
+    return select(*EXPORT_COLUMNS[name])
+
+
+def export_response(name: str, query, fmt: str) -> StreamingResponse:
+    """Stream the rows of the query as NDJSON or CSV using a server-side cursor."""
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {fmt}")
+
+    columns = EXPORT_COLUMNS[name]
+    return StreamingResponse(
+        _stream_rows(query, columns, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
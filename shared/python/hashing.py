@@ -0,0 +1,68 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import update
+
+from connection import SessionLocal
+from helpers import get_pwd_context, logger
+from models import User
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 2)))
+
+pwd_context = get_pwd_context()
+logger_info = logger()
+
+_executor = None
+_background_tasks = set()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    # bcrypt releases the GIL, so a thread pool gives real parallelism without pickling overhead.
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hashing")
+    return _executor
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop."""
+    if not hashed_password:
+        return False
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), pwd_context.verify, plain_password, hashed_password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    return pwd_context.needs_update(hashed_password)
+
+
+async def _rehash_user_password(user_id: str, plain_password: str):
+    try:
+        new_hash = await hash_password(plain_password)
+        async with SessionLocal() as session:
+            await session.execute(update(User).where(User.id == user_id).values(password=new_hash))
+            await session.commit()
+    except Exception:
+        logger_info.exception("Could not rehash password for user %s", user_id)
+
+
+def schedule_rehash(user_id: str, plain_password: str):
+    """Rehash a password with the current cost factor after the response has been sent."""
+    task = asyncio.create_task(_rehash_user_password(user_id, plain_password))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -6,7 +6,8 @@ from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta, timezone
 from jose import jwt
 from fastapi import HTTPException, status
-from connection import session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import User
 from jose import JWTError, jwt
 import logging
@@ -17,26 +18,27 @@ from datetime import date
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 SECRET_KEY = os.getenv("SECRET_KEY")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def logger():
-    logging.basicConfig(level=logging.INFO)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
     logger = logging.getLogger(__name__)
     return logger
 
 logger_info = logger()
 
 def get_pwd_context():
-    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return pwd_context
 
 def get_oauth2_scheme():
     return OAuth2PasswordBearer(tokenUrl="token")
 
 def get_password_hash(password: str) -> str:
-    pwd_context = get_pwd_context()
     return pwd_context.hash(password)
 
 def verify_password(plain_password, hashed_password):
-    pwd_context = get_pwd_context()
     return pwd_context.verify(plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -48,7 +50,7 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode["exp"] = expire
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str):
+async def get_current_user(session: AsyncSession, token: str):
     if token is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="No token provided")
 
@@ -58,7 +60,7 @@ def get_current_user(token: str):
         if email is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-        user = session.query(User).where(User.email == email).first()
+        user = await get_user_by_email(session, email)
         if user is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
         return user
@@ -66,10 +68,11 @@ def get_current_user(token: str):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
 
-def get_user_by_email(email: str) -> User:
-    return session.query(User).filter(User.email == email).first()
+async def get_user_by_email(session: AsyncSession, email: str) -> User:
+    result = await session.execute(select(User).where(User.email == email))
+    return result.scalars().first()
 
-def get_user_by_id(user_id: str) -> User:
-    return session.query(User).filter(User.id == user_id).first()
+async def get_user_by_id(session: AsyncSession, user_id: str) -> User:
+    return await session.get(User, user_id)
 
 
@@ -0,0 +1,31 @@
+import os
+import time
+import uuid
+
+_MASK_48 = (1 << 48) - 1
+_MASK_62 = (1 << 62) - 1
+
+
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID (RFC 9562 version 7): 48 bits of Unix milliseconds, then random bits.
+
+    Keys generated close in time land next to each other in the primary key and foreign key
+    indexes, so inserts append to the right-most pages instead of splitting random ones.
+    """
+    random_bits = int.from_bytes(os.urandom(10), "big")
+    value = (time.time_ns() // 1_000_000 & _MASK_48) << 80
+    value |= 0x7 << 76
+    value |= (random_bits >> 64 & 0xFFF) << 64
+    value |= 0b10 << 62
+    value |= random_bits & _MASK_62
+    return uuid.UUID(int=value)
+
+
+def new_id() -> str:
+    """Primary key for a new row, in the canonical string form the models exchange."""
+    return str(uuid7())
+
+
+def canonical_id(value: str) -> str:
+    """Normalize an id received from a client; raises ValueError when it is not a UUID."""
+    return str(uuid.UUID(value))
@@ -0,0 +1,119 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ids import canonical_id
+from models import Operation
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+SORT_COLUMNS = {
+    "created_at": (Operation.created_at, datetime.fromisoformat),
+    "annual_interest": (Operation.annual_interest, Decimal),
+    "deadline": (Operation.deadline, date.fromisoformat),
+}
+
+OPERATION_COLUMNS = (
+    Operation.id,
+    Operation.operator_id,
+    Operation.required_amount,
+    Operation.annual_interest,
+    Operation.current_amount,
+    Operation.status,
+    Operation.deadline,
+    Operation.created_at,
+)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def encode_cursor(sort: str, value, row_id: str) -> str:
+    payload = json.dumps([sort, value, row_id], default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if cursor_sort != sort:
+            raise ValueError("cursor belongs to another sort order")
+        _, parse = SORT_COLUMNS[sort.lstrip("-")]
+        return parse(value), canonical_id(row_id)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_sort(sort: str) -> tuple:
+    field = sort.lstrip("-")
+    if field not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unsupported sort field: {field}")
+    return SORT_COLUMNS[field][0], sort.startswith("-")
+
+
+def build_operations_query(
+    operator_id: str = None,
+    status: bool = None,
+    min_interest: float = None,
+    max_interest: float = None,
+    deadline_from: date = None,
+    deadline_to: date = None,
+):
+    """Select the listing columns of the operations matching the given filters."""
+    query = select(*OPERATION_COLUMNS)
+    if operator_id is not None:
+        query = query.where(Operation.operator_id == operator_id)
+    if status is not None:
+        query = query.where(Operation.status == status)
+    if min_interest is not None:
+        query = query.where(Operation.annual_interest >= min_interest)
+    if max_interest is not None:
+        query = query.where(Operation.annual_interest <= max_interest)
+    if deadline_from is not None:
+        query = query.where(Operation.deadline >= deadline_from)
+    if deadline_to is not None:
+        query = query.where(Operation.deadline <= deadline_to)
+    return query
+
+
+async def list_operations(
+    session: AsyncSession,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    sort: str = "-created_at",
+    **filters
+) -> dict:
+    """Return one keyset-paginated page of operations and the cursor of the next one."""
+    column, descending = parse_sort(sort)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = build_operations_query(**filters)
+
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort)
+        key = tuple_(column, Operation.id)
+        query = query.where(key < (value, row_id) if descending else key > (value, row_id))
+
+    if descending:
+        query = query.order_by(column.desc(), Operation.id.desc())
+    else:
+        query = query.order_by(column.asc(), Operation.id.asc())
+
+    rows = (await session.execute(query.limit(limit + 1))).mappings().all()
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(sort, last[column.key], last["id"])
+    return {"items": items, "next_cursor": next_cursor}
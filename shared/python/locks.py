@@ -0,0 +1,89 @@
+import asyncio
+import os
+import tempfile
+import zlib
+from contextlib import asynccontextmanager
+
+from sqlalchemy import text
+
+from connection import get_engine
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_DIR = os.getenv("LOCK_DIR") or tempfile.gettempdir()
+
+
+def _lock_key(name: str) -> int:
+    return zlib.crc32(f"klimb:{name}".encode())
+
+
+def _lock_path(name: str) -> str:
+    return os.path.join(LOCK_DIR, f"klimb-{name}.lock")
+
+
+@asynccontextmanager
+async def leader_lock(name: str):
+    """Non-blocking lock shared by every worker; yields whether this one got it.
+
+    PostgreSQL deployments use a session advisory lock, so workers on different hosts
+    exclude each other. Other databases fall back to an flock on a file, which covers
+    the workers of one host.
+    """
+    engine = get_engine()
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as connection:
+            acquired = await connection.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": _lock_key(name)})
+            await connection.commit()
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _lock_key(name)})
+                    await connection.commit()
+        return
+
+    if fcntl is None:
+        yield True
+        return
+    with open(_lock_path(name), "a") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+@asynccontextmanager
+async def exclusive_lock(name: str):
+    """Blocking counterpart of leader_lock: waits until no other worker or process holds it.
+
+    Used for one-time startup work (seeding, migrations) that every worker may attempt.
+    """
+    engine = get_engine()
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _lock_key(name)})
+            await connection.commit()
+            try:
+                yield
+            finally:
+                await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _lock_key(name)})
+                await connection.commit()
+        return
+
+    if fcntl is None:
+        yield
+        return
+    with open(_lock_path(name), "a") as handle:
+        await asyncio.to_thread(fcntl.flock, handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
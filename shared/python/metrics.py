@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from fastapi.templating import Jinja2Templates
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from helpers import logger
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_MS", "500")) / 1000
+SLOW_REQUEST_LOG_SQL = os.getenv("SLOW_REQUEST_LOG_SQL", "false").lower() == "true"
+MAX_LOGGED_STATEMENTS = 50
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+logger_info = logger()
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with one series per label set."""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                labels = _format_labels(self.labels, label_values)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels + ('le',), label_values + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time spent serving HTTP requests.", ("method", "route", "status")
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements issued per HTTP request.", ("route",), COUNT_BUCKETS
+)
+REQUEST_SQL_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request.", ("route",)
+)
+QUERY_LATENCY = Histogram("db_query_duration_seconds", "Time spent executing single SQL statements.")
+TEMPLATE_RENDER = Histogram("template_render_seconds", "Time spent rendering Jinja2 templates.", ("template",))
+SLOW_REQUESTS = Counter("http_slow_requests_total", "Requests slower than SLOW_REQUEST_MS.", ("route",))
+EXPIRY_SWEEPS = Counter(
+    "operation_expiry_sweeps_total", "Expiry sweeps by outcome (completed, skipped, failed).", ("outcome",)
+)
+EXPIRY_SWEEP_TIME = Histogram("operation_expiry_sweep_seconds", "Time spent in completed expiry sweeps.")
+OPERATIONS_EXPIRED = Counter("operations_expired_total", "Operations closed because their deadline passed.")
+ARCHIVE_SWEEPS = Counter(
+    "operation_archive_sweeps_total", "Archive sweeps by outcome (completed, skipped, failed).", ("outcome",)
+)
+ARCHIVE_SWEEP_TIME = Histogram("operation_archive_sweep_seconds", "Time spent in completed archive sweeps.")
+OPERATIONS_ARCHIVED = Counter("operations_archived_total", "Closed operations moved to the archive tables.")
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests turned away before running, by route class and reason (rate_limited, overloaded).",
+    ("route_class", "reason"),
+)
+
+METRICS = [
+    REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_SQL_TIME, QUERY_LATENCY, TEMPLATE_RENDER, SLOW_REQUESTS,
+    EXPIRY_SWEEPS, EXPIRY_SWEEP_TIME, OPERATIONS_EXPIRED, ARCHIVE_SWEEPS, ARCHIVE_SWEEP_TIME, OPERATIONS_ARCHIVED,
+    ADMISSION_REJECTIONS,
+]
+
+
+class RequestStats:
+    __slots__ = ("queries", "sql_seconds", "template_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = []
+
+
+request_stats: ContextVar = ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine=Engine):
+    """Count and time every statement, attributing it to the current request if any.
+
+    Listens on the Engine class by default, so engines built lazily after import are covered.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _end_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        QUERY_LATENCY.observe(elapsed)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_seconds += elapsed
+            if SLOW_REQUEST_LOG_SQL and len(stats.statements) < MAX_LOGGED_STATEMENTS:
+                stats.statements.append((elapsed, statement))
+
+
+class TimedJinja2Templates(Jinja2Templates):
+    """Jinja2Templates that records how long each template takes to render."""
+
+    def TemplateResponse(self, name: str, context: dict, *args, **kwargs):
+        started = time.perf_counter()
+        response = super().TemplateResponse(name, context, *args, **kwargs)
+        elapsed = time.perf_counter() - started
+        TEMPLATE_RENDER.observe(elapsed, name)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.template_seconds += elapsed
+        return response
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, SQL usage and slow requests per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        response = {"status": 500, "event_stream": False}
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                response["event_stream"] = content_type.startswith(b"text/event-stream")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            route_path = route.path if route is not None else "other"
+            REQUEST_LATENCY.observe(elapsed, scope["method"], route_path, response["status"])
+            REQUEST_QUERIES.observe(stats.queries, route_path)
+            REQUEST_SQL_TIME.observe(stats.sql_seconds, route_path)
+            # Event streams stay open for the whole session, their duration is not latency.
+            if elapsed >= SLOW_REQUEST_SECONDS and not response["event_stream"]:
+                self._log_slow_request(scope["method"], route_path, elapsed, stats)
+
+    @staticmethod
+    def _log_slow_request(method: str, route_path: str, elapsed: float, stats: RequestStats):
+        SLOW_REQUESTS.inc(route_path)
+        logger_info.warning(
+            "Slow request %s %s: %.0fms total, %d queries in %.0fms, templates %.0fms",
+            method, route_path, elapsed * 1000, stats.queries, stats.sql_seconds * 1000, stats.template_seconds * 1000,
+        )
+        for duration, statement in stats.statements:
+            logger_info.warning("  %.1fms %s", duration * 1000, " ".join(statement.split()))
+
+
+def render_metrics(gauges: dict = None) -> str:
+    """Prometheus text exposition of every metric plus extra gauges {name: value}."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, value in (gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,224 @@
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from connection import SessionLocal
+from events import event_hub
+from models import Bid, Operation
+
+ORDER_BOOK_CHANGED = "order_book.changed"
+
+
+def _to_cents(amount) -> int:
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+def _to_micros(moment: datetime) -> int:
+    return int(moment.timestamp() * 1_000_000) if moment else 0
+
+
+class OperationBook:
+    """Bids of one operation, ranked by interest rate (cheapest first) and then by time."""
+
+    def __init__(self, operation_id: str, required_amount):
+        self.operation_id = operation_id
+        self.required_cents = _to_cents(required_amount)
+        self._ids = []
+        self._known = set()
+        self._amounts = []
+        self._rates = []
+        self._times = []
+        self._sorted = None
+
+    def add(self, bid_id: str, amount, rate, bid_date: datetime):
+        # A bid shared by another worker may already be in a book reloaded from the database.
+        if bid_id in self._known:
+            return
+        self._known.add(bid_id)
+        self._ids.append(bid_id)
+        self._amounts.append(_to_cents(amount))
+        self._rates.append(float(rate))
+        self._times.append(_to_micros(bid_date))
+        self._sorted = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def arrays(self) -> tuple:
+        """Return (ids, amounts in cents, rates, times) in ranking order."""
+        if self._sorted is None:
+            amounts = np.asarray(self._amounts, dtype=np.int64)
+            rates = np.asarray(self._rates, dtype=np.float64)
+            times = np.asarray(self._times, dtype=np.int64)
+            order = np.lexsort((times, rates))
+            self._sorted = (np.asarray(self._ids, dtype=object)[order], amounts[order], rates[order], times[order])
+        return self._sorted
+
+    def allocate(self, include_fills: bool = True) -> dict:
+        ids, amounts, rates, _ = self.arrays()
+        filled_before = np.cumsum(amounts) - amounts
+        fills = np.clip(self.required_cents - filled_before, 0, amounts)
+        return _allocation(self.operation_id, self.required_cents, ids, amounts, rates, fills, include_fills)
+
+
+def _allocation(operation_id, required_cents, ids, amounts, rates, fills, include_fills) -> dict:
+    filled = np.flatnonzero(fills)
+    partial = np.flatnonzero((fills > 0) & (fills < amounts))
+    allocation = {
+        "operation_id": operation_id,
+        "required_amount": required_cents / 100,
+        "offered_amount": int(amounts.sum()) / 100,
+        "allocated_amount": int(fills.sum()) / 100,
+        "clearing_rate": float(rates[filled[-1]]) if filled.size else None,
+        "bids": len(ids),
+        "filled_bids": int(filled.size),
+        "partial_bid_id": ids[partial[0]] if partial.size else None,
+    }
+    if include_fills:
+        allocation["fills"] = [
+            {"bid_id": ids[i], "amount": int(amounts[i]) / 100, "rate": float(rates[i]), "allocated": int(fills[i]) / 100}
+            for i in range(len(ids))
+        ]
+    return allocation
+
+
+class OrderBooks:
+    """Order books of every open operation, kept in each worker.
+
+    Changes go through share_change, which applies them here and sends them to the other
+    workers over the event hub, so every worker allocates from the same bids.
+    """
+
+    def __init__(self):
+        self.books = {}
+
+    async def load(self, session: AsyncSession):
+        """Rebuild every book from the bids of open operations."""
+        # One statement, so operations and bids come from the same snapshot even when an
+        # operation is reopened or closed while the books load.
+        books = {}
+        rows = await session.stream(
+            select(
+                Operation.id, Operation.required_amount,
+                Bid.id, Bid.invested_amount, Bid.interest_rate, Bid.bid_date,
+            )
+            .outerjoin(Bid, Bid.operation_id == Operation.id)
+            .where(Operation.status == True)
+            .execution_options(yield_per=5000)
+        )
+        async for operation_id, required_amount, bid_id, amount, rate, bid_date in rows:
+            book = books.get(operation_id)
+            if book is None:
+                book = books[operation_id] = OperationBook(operation_id, required_amount)
+            if bid_id is not None:
+                book.add(bid_id, amount, rate, bid_date)
+        self.books = books
+
+    async def load_operation(self, session: AsyncSession, operation_id: str):
+        """Build the book of one operation from the database, whatever its status."""
+        operation = await session.get(Operation, operation_id)
+        if operation is None:
+            return None
+        book = OperationBook(operation_id, operation.required_amount)
+        bids = await session.execute(
+            select(Bid.id, Bid.invested_amount, Bid.interest_rate, Bid.bid_date).where(Bid.operation_id == operation_id)
+        )
+        for bid_id, amount, rate, bid_date in bids:
+            book.add(bid_id, amount, rate, bid_date)
+        if operation.status:
+            self.books[operation_id] = book
+        else:
+            self.books.pop(operation_id, None)
+        return book
+
+    def open_operation(self, operation_id: str, required_amount):
+        self.books[operation_id] = OperationBook(operation_id, required_amount)
+
+    def close_operation(self, operation_id: str):
+        self.books.pop(operation_id, None)
+
+    def add_bid(self, bid: Bid):
+        book = self.books.get(bid.operation_id)
+        if book is not None:
+            book.add(bid.id, bid.invested_amount, bid.interest_rate, bid.bid_date)
+
+    def apply(self, change: dict):
+        """Apply a change made by share_change, in this worker or in another one."""
+        action = change["action"]
+        if action == "open":
+            self.open_operation(change["operation_id"], Decimal(change["required_amount"]))
+        elif action == "close":
+            for operation_id in change["operation_ids"]:
+                self.close_operation(operation_id)
+        elif action == "bid":
+            book = self.books.get(change["operation_id"])
+            if book is not None:
+                book.add(
+                    change["bid_id"], Decimal(change["amount"]), Decimal(change["rate"]),
+                    datetime.fromisoformat(change["bid_date"]),
+                )
+        elif action == "reload":
+            return self._reload(change["operation_id"])
+
+    async def _reload(self, operation_id: str):
+        async with SessionLocal() as session:
+            await self.load_operation(session, operation_id)
+
+    async def share_change(self, action: str, **data):
+        """Apply a change to the books of this worker, then send it to the other workers.
+
+        Actions: open (operation_id, required_amount), close (operation_ids), bid (a placed
+        bid, see bid_change) and reload (operation_id, read again from the database).
+        """
+        change = {"action": action, **data}
+        pending = self.apply(change)
+        if pending is not None:
+            await pending
+        await event_hub.share(ORDER_BOOK_CHANGED, change)
+
+    def allocate_all(self, include_fills: bool = False) -> list:
+        """Allocate every book in one vectorized pass instead of one pass per operation."""
+        books = [book for book in self.books.values() if len(book)]
+        if not books:
+            return []
+
+        arrays = [book.arrays() for book in books]
+        sizes = np.fromiter((len(book) for book in books), dtype=np.int64, count=len(books))
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        amounts = np.concatenate([item[1] for item in arrays])
+        rates = np.concatenate([item[2] for item in arrays])
+        required = np.repeat(np.fromiter((book.required_cents for book in books), dtype=np.int64), sizes)
+
+        # Each book is already ranked, so a global cumsum minus the running total at the
+        # start of each book gives the amount filled ahead of every bid within its book.
+        running = np.cumsum(amounts)
+        book_offset = np.repeat(running[starts] - amounts[starts], sizes)
+        filled_before = running - amounts - book_offset
+        fills = np.clip(required - filled_before, 0, amounts)
+
+        return [
+            _allocation(
+                book.operation_id, book.required_cents, item[0],
+                amounts[start:start + size], rates[start:start + size], fills[start:start + size],
+                include_fills,
+            )
+            for book, item, start, size in zip(books, arrays, starts, sizes)
+        ]
+
+
+def bid_change(bid: Bid) -> dict:
+    """The arguments of share_change("bid", ...) for a placed bid."""
+    return {
+        "operation_id": bid.operation_id,
+        "bid_id": bid.id,
+        "amount": str(bid.invested_amount),
+        "rate": str(bid.interest_rate),
+        "bid_date": bid.bid_date.isoformat(),
+    }
+
+
+order_books = OrderBooks()
+event_hub.on(ORDER_BOOK_CHANGED, order_books.apply)
@@ -0,0 +1,53 @@
+"""Monthly range partitions of the bids table on PostgreSQL; no-ops on other databases."""
+import os
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+from connection import get_engine
+from locks import leader_lock
+
+BID_PARTITION_MONTHS_AHEAD = int(os.getenv("BID_PARTITION_MONTHS_AHEAD", "3"))
+
+_UPPER_BOUND = re.compile(r"TO \('(\d{4}-\d{2}-\d{2})")
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"bids_{month:%Y_%m}"
+
+
+async def ensure_bid_partitions(months_ahead: int = BID_PARTITION_MONTHS_AHEAD, today: date = None) -> list:
+    """Create the missing monthly partitions up to months_ahead; returns the names created."""
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        return []
+    today = today or date.today()
+    async with leader_lock("bid-partitions") as leader:
+        if not leader:
+            return []
+        async with engine.begin() as connection:
+            # Adding a partition briefly locks the parent; retry on the next sweep rather than wait.
+            await connection.execute(text("SET LOCAL lock_timeout = '2s'"))
+            bounds = await connection.scalars(text(
+                "SELECT pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'bids'::regclass"
+            ))
+            # Partitions are contiguous, so the next one starts where the newest one ends.
+            upper_bounds = [date.fromisoformat(match.group(1)) for match in map(_UPPER_BOUND.search, bounds) if match]
+            month = max([month_start(today), *upper_bounds])
+            created = []
+            while month <= month_start(today, months_ahead):
+                name = partition_name(month)
+                await connection.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF bids "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{month_start(month, 1).isoformat()}')"
+                ))
+                created.append(name)
+                month = month_start(month, 1)
+        return created
@@ -0,0 +1,51 @@
+import asyncio
+from abc import ABC, abstractmethod
+
+from helpers import logger
+
+logger_info = logger()
+
+
+class PeriodicSweep(ABC):
+    """Runs sweep() every interval seconds in a background task of the worker.
+
+    Subclasses implement sweep() and set description (for the logs) and, optionally, sweeps,
+    a Counter labelled by outcome that records the failed sweeps next to the ones sweep()
+    records itself.
+    """
+
+    description = "Sweep"
+    sweeps = None
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last_sweep = None
+        self._task = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger_info.exception("%s failed", self.description)
+                # Nothing raised here may escape: it would end the loop and no sweep would run again.
+                if self.sweeps is not None:
+                    self.sweeps.inc("failed")
+            await asyncio.sleep(self.interval)
+
+    @abstractmethod
+    async def sweep(self):
+        """One pass of the periodic job."""
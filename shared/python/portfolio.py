@@ -0,0 +1,76 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+
+from models import ArchivedBid, ArchivedOperation, Bid, Operation
+
+
+def investor_bids_query(investor_id: str, archived: bool = False):
+    """Bids of an investor with their operation loaded through the same join.
+
+    archived selects the bids of archived operations instead, read from the cold tables.
+    """
+    bid, operation = (ArchivedBid, ArchivedBid.operation) if archived else (Bid, Bid.operation)
+    return (
+        select(bid)
+        .join(operation)
+        .options(contains_eager(operation))
+        .where(bid.investor_id == investor_id)
+        .order_by(bid.bid_date.desc(), bid.id)
+    )
+
+
+async def get_portfolio_summary(session: AsyncSession, investor_id: str) -> dict:
+    """Aggregate an investor's bids per operation status and per operator in SQL.
+
+    Archived operations are closed, so their bids add to the closed totals.
+    """
+    per_status, per_operator = {}, {}
+    for bid, operation in ((Bid, Operation), (ArchivedBid, ArchivedOperation)):
+        weighted = func.sum(bid.invested_amount * bid.interest_rate)
+        invested = func.sum(bid.invested_amount)
+        by_status = await session.execute(
+            select(operation.status, func.count(bid.id), invested, weighted)
+            .join(bid.operation)
+            .where(bid.investor_id == investor_id)
+            .group_by(operation.status)
+        )
+        for is_open, bids, amount, weighted_amount in by_status:
+            totals = per_status.setdefault("open" if is_open else "closed", [0, 0, 0])
+            totals[0] += bids
+            totals[1] += amount or 0
+            totals[2] += weighted_amount or 0
+        by_operator = await session.execute(
+            select(operation.operator_id, func.count(bid.id), invested)
+            .join(bid.operation)
+            .where(bid.investor_id == investor_id)
+            .group_by(operation.operator_id)
+        )
+        for operator_id, bids, amount in by_operator:
+            totals = per_operator.setdefault(operator_id, [0, 0])
+            totals[0] += bids
+            totals[1] += amount or 0
+
+    statuses = []
+    total_bids, total_invested, total_weighted = 0, 0, 0
+    for name, (bids, amount, weighted_amount) in sorted(per_status.items()):
+        statuses.append({
+            "status": name,
+            "bids": bids,
+            "invested_amount": float(amount),
+            "weighted_average_rate": float(weighted_amount / amount) if amount else 0.0,
+        })
+        total_bids += bids
+        total_invested += amount
+        total_weighted += weighted_amount
+
+    return {
+        "bids": total_bids,
+        "invested_amount": float(total_invested),
+        "weighted_average_rate": float(total_weighted / total_invested) if total_invested else 0.0,
+        "by_status": statuses,
+        "by_operator": [
+            {"operator_id": operator_id, "bids": bids, "exposure": float(amount)}
+            for operator_id, (bids, amount) in sorted(per_operator.items(), key=lambda item: item[1][1], reverse=True)
+        ],
+    }
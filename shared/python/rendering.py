@@ -0,0 +1,101 @@
+import asyncio
+import inspect
+import os
+import time
+from contextlib import suppress
+
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from connection import ReadSessionLocal
+from metrics import TEMPLATE_RENDER
+
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR")
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_QUEUE_SIZE = 256
+
+_END = object()
+
+
+def template_environment(directory: str, enable_async: bool = False) -> Environment:
+    """Jinja2 environment whose compiled templates are cached on disk between processes."""
+    if TEMPLATE_CACHE_DIR:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=True,
+        enable_async=enable_async,
+        # Sync and async compilations of a template differ, so they must not share cache files.
+        bytecode_cache=FileSystemBytecodeCache(
+            TEMPLATE_CACHE_DIR, "__jinja2_async_%s.cache" if enable_async else "__jinja2_%s.cache"
+        ),
+    )
+
+
+async def stream_rows(query, batch_size: int = STREAM_BATCH_SIZE):
+    """Yield the ORM objects of the query as the server-side cursor delivers them."""
+    # The request session is closed once the handler returns, so the stream owns its own.
+    async with ReadSessionLocal() as session:
+        result = await session.stream(query.execution_options(yield_per=batch_size))
+        async for row in result.scalars():
+            yield row
+
+
+class StreamingJinja2Templates(Jinja2Templates):
+    """Async Jinja2 templates sent to the client while they render.
+
+    Only StreamingTemplateResponse works with this environment; the inherited
+    TemplateResponse renders synchronously and needs a regular one.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__(env=template_environment(directory, enable_async=True))
+
+    def StreamingTemplateResponse(self, name: str, context: dict, status_code: int = 200, headers: dict = None):
+        template = self.get_template(name)
+        return StreamingResponse(
+            self._render(name, template, context), status_code=status_code, headers=headers, media_type="text/html"
+        )
+
+    @staticmethod
+    async def _render(name: str, template, context: dict):
+        # The template renders in its own task. Whatever it produced is flushed whenever it
+        # waits on the database, so the page header is sent before the first row is fetched.
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        started = time.perf_counter()
+
+        async def produce():
+            try:
+                async for chunk in template.generate_async(context):
+                    await queue.put(chunk)
+                await queue.put(_END)
+            except Exception as exc:
+                await queue.put(exc)
+
+        producer = asyncio.create_task(produce())
+        try:
+            finished = False
+            while not finished:
+                parts = [await queue.get()]
+                size = len(parts[0]) if isinstance(parts[0], str) else 0
+                while not queue.empty() and size < STREAM_CHUNK_SIZE:
+                    parts.append(queue.get_nowait())
+                    size += len(parts[-1]) if isinstance(parts[-1], str) else 0
+                if isinstance(parts[-1], Exception):
+                    raise parts[-1]
+                if parts[-1] is _END:
+                    parts.pop()
+                    finished = True
+                if parts:
+                    yield "".join(parts)
+            TEMPLATE_RENDER.observe(time.perf_counter() - started, name)
+        finally:
+            producer.cancel()
+            with suppress(asyncio.CancelledError):
+                await producer
+            # Row iterators left half-read by a disconnected client still hold a session.
+            for value in context.values():
+                if inspect.isasyncgen(value):
+                    await value.aclose()
@@ -0,0 +1,122 @@
+import hashlib
+import os
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from cache import TTLCache
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+
+class LocalStore:
+    """Keeps cached payloads and table versions in this process (LRU)."""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.versions = defaultdict(int)
+
+    async def get(self, key: str):
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: tuple, ttl: float = None):
+        self.entries.set(key, value, ttl)
+
+    async def version(self, table: str) -> int:
+        return self.versions[table]
+
+    async def bump(self, table: str):
+        self.versions[table] += 1
+
+
+class RedisStore:
+    """Shares cached payloads and table versions between workers through Redis."""
+
+    def __init__(self, url: str, ttl: float = RESPONSE_CACHE_TTL):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("The redis package is required to use RESPONSE_CACHE_URL")
+        self._client = redis.from_url(url)
+        self._ttl = int(ttl)
+
+    async def get(self, key: str):
+        value = await self._client.get(f"klimb:cache:{key}")
+        if value is None:
+            return None
+        etag, body = value.split(b"\n", 1)
+        return etag.decode(), body
+
+    async def set(self, key: str, value: tuple, ttl: float = None):
+        etag, body = value
+        expires = max(1, int(min(ttl, self._ttl))) if ttl is not None else self._ttl
+        await self._client.set(f"klimb:cache:{key}", etag.encode() + b"\n" + body, ex=expires)
+
+    async def version(self, table: str) -> int:
+        return int(await self._client.get(f"klimb:version:{table}") or 0)
+
+    async def bump(self, table: str):
+        await self._client.incr(f"klimb:version:{table}")
+
+
+def get_store():
+    url = os.getenv("RESPONSE_CACHE_URL")
+    return RedisStore(url) if url else LocalStore()
+
+
+class ResponseCache:
+    """Caches serialized payloads under a per-table version that every write bumps.
+
+    Writes never delete entries: bumping the version changes every key of the table,
+    so stale payloads are simply never read again and age out of the store.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or LocalStore()
+        self.hits = 0
+        self.misses = 0
+
+    async def key(self, table: str, scope: str, params: dict) -> str:
+        version = await self.store.version(table)
+        query = urlencode(sorted((name, str(value)) for name, value in params.items() if value is not None))
+        return f"{table}:v{version}:{scope}:{query}"
+
+    async def get(self, key: str):
+        entry = await self.store.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def set(self, key: str, body: bytes, ttl: float = None) -> tuple:
+        entry = (f'"{hashlib.sha256(body).hexdigest()}"', body)
+        await self.store.set(key, entry, ttl)
+        return entry
+
+    async def invalidate(self, table: str):
+        await self.store.bump(table)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.store).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def etag_response(request: Request, entry: tuple, media_type: str = "application/json") -> Response:
+    """Answer 304 when the client already holds this payload, else send it with its strong ETag."""
+    etag, body = entry
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+listing_cache = ResponseCache(get_store())
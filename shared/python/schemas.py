@@ -1,5 +1,11 @@
-from pydantic import BaseModel
-from datetime import date
+from pydantic import AfterValidator, BaseModel
+from datetime import date, datetime
+from typing import Annotated, List, Optional
+
+from ids import canonical_id
+
+# Ids sent by clients; a malformed one is rejected with a 422 instead of reaching a uuid column.
+EntityId = Annotated[str, AfterValidator(canonical_id)]
 
 class UserCreate(BaseModel):
     first_name: str
@@ -27,10 +33,69 @@ class OperationCreateRequest(BaseModel):
 
 
 class OperationUpdateRequest(BaseModel):
-    operation_id: str
+    operation_id: EntityId
 
 
 class BidRequest(BaseModel):
-    operation_id: str
+    operation_id: EntityId
+    invested_amount: float
+    interest_rate: float
+
+class OperationResponse(BaseModel):
+    id: str
+    operator_id: Optional[str]
+    required_amount: float
+    annual_interest: float
+    current_amount: float
+    status: bool
+    deadline: date
+    created_at: Optional[datetime]
+
+
+class OperationPage(BaseModel):
+    items: List[OperationResponse]
+    next_cursor: Optional[str]
+
+
+class StatusTotals(BaseModel):
+    status: str
+    bids: int
+    invested_amount: float
+    weighted_average_rate: float
+
+
+class OperatorExposure(BaseModel):
+    operator_id: Optional[str]
+    bids: int
+    exposure: float
+
+
+class PortfolioSummary(BaseModel):
+    bids: int
+    invested_amount: float
+    weighted_average_rate: float
+    by_status: List[StatusTotals]
+    by_operator: List[OperatorExposure]
+
+
+class CashFlow(BaseModel):
+    date: date
+    positions: int
+    principal: float
+    interest: float
+    payout: float
+
+
+class PortfolioProjection(BaseModel):
+    investor_id: str
+    as_of: date
+    method: str
+    basis: int
+    positions: int
     invested_amount: float
-    interest_rate: float
\ No newline at end of file
+    accrued_interest: float
+    expected_interest: float
+    expected_payout: float
+    outstanding_amount: float
+    annualized_yield: float
+    schedule: List[CashFlow]
@@ -1,18 +1,20 @@
-import uuid
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import User
-from connection import session
-from helpers import get_pwd_context
+from connection import SessionLocal
+from hashing import hash_password
+from ids import new_id
 
 
-pwd_context = get_pwd_context()
+async def run_seeder():
+    async with SessionLocal() as session:
+        await seeder_admin_user(session)
 
 
-def run_seeder():
-    seeder_admin_user()
-
-
-def seeder_admin_user():
-    user = session.query(User).where(User.role == "Admin").first()
+async def seeder_admin_user(session: AsyncSession):
+    result = await session.execute(select(User).where(User.role == "Admin"))
+    user = result.scalars().first()
 
     first_name = "Admin"
     last_name = "Admin"
@@ -20,22 +22,22 @@ def seeder_admin_user():
     
     if not user:
         admin_user = User(
-            id = str(uuid.uuid4()),
+            id = new_id(),
             first_name = first_name,
             last_name = last_name,
             full_name = full_name,
             nickname = "Admin",
             email = "admin@admin.com",
             phone = "0000000000",
-            password = pwd_context.hash("admin"),
+            password = await hash_password("admin"),
             role = "Admin",
             country = "Colombia",
             state = "Risaralda",
             city = "Pereira"
         )
         session.add(admin_user)
-        session.commit()
+        await session.commit()
 
 
 if __name__ == '__main__':
-    run_seeder()
\ No newline at end of file
+    asyncio.run(run_seeder())
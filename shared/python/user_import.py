@@ -0,0 +1,252 @@
+import asyncio
+import codecs
+import csv
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from connection import SessionLocal
+from hashing import hash_password
+from helpers import logger
+from ids import new_id
+from models import User, UserImportJob
+from schemas import UserCreate
+
+IMPORT_BATCH_SIZE = int(os.getenv("USER_IMPORT_BATCH_SIZE", "500"))
+IMPORT_JOB_TTL = float(os.getenv("USER_IMPORT_JOB_TTL", "86400"))
+# Rows past this many failures are counted but not detailed: the report is saved after every batch.
+IMPORT_MAX_ERRORS = int(os.getenv("USER_IMPORT_MAX_ERRORS", "1000"))
+IMPORT_FORMATS = ("csv", "ndjson")
+USER_ROLES = ("Admin", "Operator", "Investor")
+UPLOAD_SPOOL_SIZE = 1024 * 1024
+
+logger_info = logger()
+
+_running_jobs = set()
+
+
+class ImportJob:
+    """Progress of one import. Saved to user_import_jobs so that any worker can report it."""
+
+    def __init__(self, fmt: str):
+        self.id = new_id()
+        self.format = fmt
+        self.status = "pending"
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.started_at = time.time()
+        self.finished_at = None
+
+    @classmethod
+    def from_row(cls, row: UserImportJob) -> "ImportJob":
+        job = cls(row.format)
+        job.id = row.id
+        job.status = row.status
+        job.rows = row.rows
+        job.created = row.created
+        job.failed = row.failed
+        job.errors = list(row.errors)
+        job.started_at = row.started_at.timestamp()
+        job.finished_at = row.finished_at.timestamp() if row.finished_at else None
+        return job
+
+    async def save(self):
+        async with SessionLocal() as session:
+            await session.merge(UserImportJob(
+                id=self.id,
+                format=self.format,
+                status=self.status,
+                rows=self.rows,
+                created=self.created,
+                failed=self.failed,
+                errors=list(self.errors),
+                started_at=datetime.fromtimestamp(self.started_at),
+                finished_at=datetime.fromtimestamp(self.finished_at) if self.finished_at else None,
+            ))
+            await session.commit()
+
+    def fail_row(self, row: int, email, error: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "email": email, "error": error})
+
+    def report(self) -> dict:
+        return {
+            "job_id": self.id,
+            "format": self.format,
+            "status": self.status,
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+async def spool_upload(request) -> tempfile.SpooledTemporaryFile:
+    """Copy the request body to a temporary file chunk by chunk, spilling to disk when large."""
+    upload = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+    async for chunk in request.stream():
+        upload.write(chunk)
+    upload.seek(0)
+    return upload
+
+
+def _parse_rows(upload, fmt: str):
+    """Yield (row number, record or parsing error) from the upload without reading it all."""
+    text = codecs.getreader("utf-8-sig")(upload)
+    if fmt == "csv":
+        for number, record in enumerate(csv.DictReader(text), start=1):
+            # Cells beyond the header land under the None key; they are not part of the schema.
+            record.pop(None, None)
+            yield number, record
+        return
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            record = exc
+        yield number, record
+
+
+def _read_batch(rows, size: int) -> list:
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) == size:
+            break
+    return batch
+
+
+def _validate(job: ImportJob, number: int, record, seen_emails: set):
+    if isinstance(record, Exception):
+        job.fail_row(number, None, f"Invalid JSON: {record}")
+        return None
+    if not isinstance(record, dict):
+        job.fail_row(number, None, "Each line must be a JSON object")
+        return None
+    try:
+        user = UserCreate.model_validate(record)
+    except ValidationError as exc:
+        errors = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors())
+        job.fail_row(number, record.get("email"), errors)
+        return None
+    if user.role not in USER_ROLES:
+        job.fail_row(number, user.email, f"Unknown role: {user.role}")
+        return None
+    if user.email in seen_emails:
+        job.fail_row(number, user.email, "Duplicate email in the upload")
+        return None
+    seen_emails.add(user.email)
+    return user
+
+
+async def _insert_batch(job: ImportJob, batch: list):
+    """Insert the batch in one transaction, falling back to row by row if a concurrent insert collides."""
+    async with SessionLocal() as session:
+        result = await session.execute(select(User.email).where(User.email.in_([user.email for _, user in batch])))
+        existing = set(result.scalars())
+    for number, user in batch:
+        if user.email in existing:
+            job.fail_row(number, user.email, "Email already registered")
+    batch = [(number, user) for number, user in batch if user.email not in existing]
+    if not batch:
+        return
+
+    # No connection is held while bcrypt runs on the hashing pool.
+    hashes = await asyncio.gather(*(hash_password(user.password) for _, user in batch))
+    rows = [
+        dict(user.model_dump(), id=new_id(), password=password_hash)
+        for (_, user), password_hash in zip(batch, hashes)
+    ]
+    async with SessionLocal() as session:
+        try:
+            await session.execute(insert(User), rows)
+            await session.commit()
+            job.created += len(rows)
+            return
+        except IntegrityError:
+            await session.rollback()
+
+        for (number, user), row in zip(batch, rows):
+            try:
+                await session.execute(insert(User), [row])
+                await session.commit()
+                job.created += 1
+            except IntegrityError:
+                await session.rollback()
+                job.fail_row(number, user.email, "Email already registered")
+
+
+async def _run_import(job: ImportJob, upload):
+    job.status = "running"
+    seen_emails = set()
+    try:
+        rows = _parse_rows(upload, job.format)
+        while True:
+            # Parsing reads the spooled file, keep it off the event loop.
+            parsed = await asyncio.to_thread(_read_batch, rows, IMPORT_BATCH_SIZE)
+            if not parsed:
+                break
+            job.rows += len(parsed)
+            batch = []
+            for number, record in parsed:
+                user = _validate(job, number, record, seen_emails)
+                if user is not None:
+                    batch.append((number, user))
+            if batch:
+                await _insert_batch(job, batch)
+            await job.save()
+        job.status = "completed"
+    except Exception as exc:
+        logger_info.exception("User import %s failed", job.id)
+        job.status = "failed"
+        job.fail_row(job.rows, None, f"Import aborted: {exc}")
+    finally:
+        upload.close()
+        job.finished_at = time.time()
+        try:
+            await job.save()
+        except Exception:
+            logger_info.exception("Could not save the report of user import %s", job.id)
+
+
+async def start_import(request, fmt: str) -> ImportJob:
+    """Spool the uploaded CSV or NDJSON body and import it in a background task."""
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported import format: {fmt}")
+
+    upload = await spool_upload(request)
+    job = ImportJob(fmt)
+    async with SessionLocal() as session:
+        await session.execute(delete(UserImportJob).where(
+            UserImportJob.started_at < datetime.fromtimestamp(job.started_at - IMPORT_JOB_TTL)
+        ))
+        await session.commit()
+    await job.save()
+    task = asyncio.create_task(_run_import(job, upload))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+    return job
+
+
+async def get_import_job(session: AsyncSession, job_id: str) -> ImportJob:
+    row = await session.get(UserImportJob, job_id)
+    if row is None or row.started_at.timestamp() < time.time() - IMPORT_JOB_TTL:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    return ImportJob.from_row(row)
@@ -0,0 +1,73 @@
+"""Online backfill of the uuid key columns added by revision f3a9c2d71e48.
+
+Run it between that revision and the swap (a8e4b6d0c135) while the application serves
+traffic. Each batch walks the text primary key index and converts a few thousand rows in
+its own short transaction, so no lock is held for long and the run can be interrupted and
+resumed at any time:
+
+    alembic upgrade f3a9c2d71e48
+    python shared/python/uuid_backfill.py --batch-size 5000 --pause 0.05
+    alembic upgrade head
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from connection import dispose_engine, get_engine
+
+KEY_COLUMNS = {
+    "users": ["id"],
+    "operations": ["id", "operator_id"],
+    "bids": ["id", "investor_id", "operation_id"],
+}
+
+
+async def backfill_table(table: str, columns: list, batch_size: int, pause: float) -> int:
+    """Convert the rows of one table in primary key order; returns how many were updated."""
+    assignments = ", ".join(f"{column}_uuid = {column}::uuid" for column in columns)
+    next_batch = text(f"SELECT id FROM {table} WHERE id > :after ORDER BY id LIMIT :limit")
+    convert = text(f"UPDATE {table} SET {assignments} WHERE id = ANY(:ids) AND id_uuid IS NULL")
+
+    after, updated = "", 0
+    while True:
+        async with get_engine().begin() as connection:
+            ids = (await connection.execute(next_batch, {"after": after, "limit": batch_size})).scalars().all()
+            if not ids:
+                return updated
+            # Rows written since the trigger was installed already have their uuid columns.
+            updated += (await connection.execute(convert, {"ids": ids})).rowcount
+        after = ids[-1]
+        if pause:
+            # Leaves room for the application's writes and for replicas to keep up.
+            await asyncio.sleep(pause)
+
+
+async def remaining(table: str) -> int:
+    async with get_engine().connect() as connection:
+        return (await connection.execute(text(f"SELECT count(*) FROM {table} WHERE id_uuid IS NULL"))).scalar()
+
+
+async def main(batch_size: int, pause: float):
+    if get_engine().dialect.name != "postgresql":
+        print("Only PostgreSQL keeps uuid shadow columns; the migration converts other databases itself.")
+        return
+    try:
+        for table, columns in KEY_COLUMNS.items():
+            started = time.perf_counter()
+            updated = await backfill_table(table, columns, batch_size, pause)
+            print(
+                f"{table}: {updated} rows converted in {time.perf_counter() - started:.1f}s, "
+                f"{await remaining(table)} left"
+            )
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.pause))
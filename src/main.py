@@ -1,44 +1,132 @@
+import asyncio
 import os
-import uuid
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Optional
 
-from fastapi import FastAPI, Request, Form, HTTPException, status, Response, Cookie
-from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request, Form, HTTPException, status, Response, Cookie, Depends, Query
+from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from models import User, Operation, Bid
-from connection import session
+from connection import (
+    get_session,
+    get_read_session,
+    is_replica_session,
+    replica_monitor,
+    ReadYourWritesMiddleware,
+    REPLICA_MAX_LAG_SECONDS,
+    SessionLocal,
+    warm_up,
+    dispose_engine
+)
 from helpers import (
-    verify_password,
     create_access_token,
     get_oauth2_scheme,
-    get_pwd_context,
     logger,
     get_user_by_email,
     get_user_by_id
 )
-from auth import authenticate_user
+from auth import authenticate_user, principal_cache
+from hashing import hash_password, verify_password, needs_rehash, schedule_rehash
+import hashing
+from listings import list_operations, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from exports import export_query, export_response
+from user_import import start_import, get_import_job
+from portfolio import investor_bids_query, get_portfolio_summary
+from projections import check_conventions, project_investor
+from bidding import place_bid
+from dashboard_stats import (
+    record_operation_created,
+    record_status_change,
+    get_operator_stats,
+    get_investor_stats
+)
+from order_book import bid_change, order_books
+from events import event_hub, operation_payload
+from expiry import expiry_scheduler, EXPIRY_ENABLED
+from archive import archive_scheduler, ARCHIVE_ENABLED
+from partitions import ensure_bid_partitions
+from response_cache import listing_cache, etag_response
+from admission import AdmissionMiddleware
+from metrics import MetricsMiddleware, TimedJinja2Templates, instrument_engine, render_metrics
+from rendering import StreamingJinja2Templates, stream_rows, template_environment
 from schemas import (
     LoginForm,
     OperationCreateRequest,
     OperationUpdateRequest,
-    BidRequest
+    BidRequest,
+    EntityId,
+    OperationPage,
+    PortfolioSummary,
+    PortfolioProjection
 )
 from seeder import run_seeder
-
-app = FastAPI()
-
-run_seeder()
+from locks import exclusive_lock
+from ids import new_id
 
 static_dir = os.path.join(os.path.dirname(__file__), "static")
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
-templates = Jinja2Templates(directory="templates")
+templates_dir = os.path.join(os.path.dirname(__file__), "templates")
+templates = TimedJinja2Templates(env=template_environment(templates_dir))
+streaming_templates = StreamingJinja2Templates(templates_dir)
 
 oauth2_scheme = get_oauth2_scheme()
-pwd_context = get_pwd_context()
 logger_info = logger()
-SECRET_KEY = os.getenv("SECRET_KEY")
+
+
+def precompile_templates():
+    for environment in (templates.env, streaming_templates.env):
+        for name in environment.list_templates():
+            environment.get_template(name)
+
+
+async def seed_database():
+    # Every worker runs this at startup; the lock makes them take turns, so only the first one inserts.
+    async with exclusive_lock("seed"):
+        await run_seeder()
+
+
+async def load_order_books():
+    async with SessionLocal() as session:
+        await order_books.load(session)
+
+
+async def create_bid_partitions():
+    # Like the archive sweep, a failure (lock timeout, rows of the month in the default partition)
+    # is logged and not fatal: the worker can serve, and the next archive sweep tries again.
+    try:
+        await ensure_bid_partitions()
+    except Exception:
+        logger_info.exception("Could not create the bid partitions at startup")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing above touches the database: importing this module stays cheap for workers and tooling.
+    await asyncio.gather(warm_up(), asyncio.to_thread(precompile_templates), event_hub.start())
+    await asyncio.gather(seed_database(), load_order_books(), create_bid_partitions())
+    await replica_monitor.start()
+    if EXPIRY_ENABLED:
+        await expiry_scheduler.start()
+    if ARCHIVE_ENABLED:
+        await archive_scheduler.start()
+    yield
+    await archive_scheduler.stop()
+    await expiry_scheduler.stop()
+    await replica_monitor.stop()
+    hashing.shutdown()
+    await event_hub.stop()
+    await dispose_engine()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
+instrument_engine()
+app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 
 @app.get("/register", response_class=HTMLResponse)
@@ -57,20 +145,21 @@ async def register_user(
     role: str = Form(...),
     country: str = Form(...),
     state: str = Form(...),
-    city: str = Form(...)
+    city: str = Form(...),
+    session: AsyncSession = Depends(get_session)
 ):
-    existing_user = get_user_by_email(email)
+    existing_user = await get_user_by_email(session, email)
     if existing_user:
         raise HTTPException(status_code=400, detail="El correo ya está registrado.")
 
     new_user = User(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         first_name=first_name,
         last_name=last_name,
         nickname=nickname,
         email=email,
         phone=phone,
-        password=pwd_context.hash(password),
+        password=await hash_password(password),
         role=role,
         country=country,
         state=state,
@@ -78,8 +167,7 @@ async def register_user(
     )
 
     session.add(new_user)
-    session.commit()
-    session.refresh(new_user)
+    await session.commit()
 
     return RedirectResponse(url="/index", status_code=303)
 
@@ -101,12 +189,15 @@ async def read_item(request: Request):
 
 
 @app.post("/token")
-async def login(form_data: LoginForm, response: Response):
-    user = get_user_by_email(form_data.username)
+async def login(form_data: LoginForm, response: Response, session: AsyncSession = Depends(get_session)):
+    user = await get_user_by_email(session, form_data.username)
 
-    if not user or not verify_password(form_data.password, user.password):
+    if not user or not await verify_password(form_data.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password")
 
+    if needs_rehash(user.password):
+        schedule_rehash(user.id, form_data.password)
+
     access_token = create_access_token(data={"sub": user.email, "role": user.role})
     response.set_cookie(key="token", value=access_token, httponly=True)
 
@@ -114,17 +205,18 @@ async def login(form_data: LoginForm, response: Response):
 
 
 @app.get("/users/me")
-async def read_users_me(token: str = Cookie(None)):
-    return await authenticate_user(token)
+async def read_users_me(token: str = Cookie(None), session: AsyncSession = Depends(get_read_session)):
+    return await authenticate_user(session, token)
 
 
 @app.get("/operator_dashboard", response_class=HTMLResponse)
-async def operator_dashboard(request: Request):
-    user = await authenticate_user(request.cookies.get("token"))
+async def operator_dashboard(request: Request, session: AsyncSession = Depends(get_read_session)):
+    user = await authenticate_user(session, request.cookies.get("token"))
     if user.role != "Operator":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
 
-    return templates.TemplateResponse("operator_dashboard.html", {"request": request, "user": user})
+    stats = await get_operator_stats(session, user.id)
+    return templates.TemplateResponse("operator_dashboard.html", {"request": request, "user": user, "stats": stats})
 
 
 @app.get("/operator/create-operation", response_class=HTMLResponse)
@@ -133,125 +225,297 @@ async def create_operation_page(request: Request):
 
 
 @app.post("/operator/create-operation")
-async def create_operation(operation: OperationCreateRequest, token: str = Cookie(None)):
-    user = await authenticate_user(token)
+async def create_operation(
+    operation: OperationCreateRequest,
+    token: str = Cookie(None),
+    session: AsyncSession = Depends(get_session)
+):
+    user = await authenticate_user(session, token)
 
     db_operation = Operation(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         operator_id=user.id,
         required_amount=operation.required_amount,
         annual_interest=operation.annual_interest,
         deadline=operation.deadline,
         current_amount=operation.current_amount,
+        created_at=datetime.now(),
     )
 
     session.add(db_operation)
-    session.commit()
+    await record_operation_created(session, db_operation)
+    await session.commit()
+    await order_books.share_change(
+        "open", operation_id=db_operation.id, required_amount=str(db_operation.required_amount)
+    )
+    await listing_cache.invalidate("operations")
+    await event_hub.publish("operation.created", operation_payload(db_operation))
 
     return RedirectResponse(url="create-operation", status_code=303)
 
 
+async def cached_operations_page(request: Request, session: AsyncSession, scope: str, **params):
+    """Serve an operations page from the listing cache, querying only after a write."""
+    key = await listing_cache.key("operations", scope, params)
+    entry = await listing_cache.get(key)
+    if entry is None:
+        page = await list_operations(session, **params)
+        # A page read from a lagging replica may predate the version bump; keep it only briefly.
+        ttl = REPLICA_MAX_LAG_SECONDS if is_replica_session(session) else None
+        entry = await listing_cache.set(key, OperationPage.model_validate(page).model_dump_json().encode(), ttl=ttl)
+    return etag_response(request, entry)
+
+
 @app.get("/operator/operations")
-async def list_operations_page(request: Request):
-    user = await authenticate_user(request.cookies.get("token"))
-
-    operations = session.query(Operation).all()
-    operations_list = [
-        {
-            'id': operation.id,
-            'operator_id': operation.operator_id,
-            'annual_interest': float(operation.annual_interest),
-            'current_amount': float(operation.current_amount),
-            'created_at': operation.created_at.strftime("%d-%m-%Y"),
-            'required_amount': float(operation.required_amount),
-            'status': operation.status,
-            'deadline': operation.deadline.strftime("%d-%m-%Y"),
-        }
-        for operation in operations
-    ]
-
-    return templates.TemplateResponse("operations.html", {"request": request, "operations": operations_list})
+async def list_operations_page(request: Request, session: AsyncSession = Depends(get_read_session)):
+    user = await authenticate_user(session, request.cookies.get("token"))
+
+    return streaming_templates.StreamingTemplateResponse("operations.html", {"request": request, "user": user})
+
+
+@app.get("/api/operator/operations", response_model=OperationPage)
+async def api_operator_operations(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    sort: str = "-created_at",
+    status_filter: Optional[bool] = Query(None, alias="status"),
+    min_interest: Optional[float] = None,
+    max_interest: Optional[float] = None,
+    deadline_from: Optional[date] = None,
+    deadline_to: Optional[date] = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    user = await authenticate_user(session, request.cookies.get("token"))
+
+    return await cached_operations_page(
+        request,
+        session,
+        scope=f"operator:{user.id}",
+        cursor=cursor,
+        limit=limit,
+        sort=sort,
+        operator_id=user.id,
+        status=status_filter,
+        min_interest=min_interest,
+        max_interest=max_interest,
+        deadline_from=deadline_from,
+        deadline_to=deadline_to,
+    )
 
 
 @app.put("/operator/update-status")
-async def update_status(request: OperationUpdateRequest):
-    db_operation = session.query(Operation).filter(Operation.id == request.operation_id).first()
+async def update_status(request: OperationUpdateRequest, session: AsyncSession = Depends(get_session)):
+    db_operation = await session.get(Operation, request.operation_id)
 
     if not db_operation:
         raise HTTPException(status_code=404, detail="Operation not found")
 
-    db_operation.status = not db_operation.status
-    session.commit()
+    # Toggle only from the status that was read: a bid that fully funds the operation or the
+    # expiry sweep may close it meanwhile, and that close is already in the dashboard totals.
+    toggled = (await session.execute(
+        update(Operation)
+        .where(Operation.id == db_operation.id, Operation.status == db_operation.status)
+        .values(status=not db_operation.status)
+        .returning(
+            Operation.status,
+            Operation.operator_id,
+            Operation.required_amount,
+            Operation.current_amount,
+            Operation.deadline,
+        )
+        .execution_options(synchronize_session=False)
+    )).first()
+    if toggled is None:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="La operación cambió de estado mientras se actualizaba, intenta de nuevo.",
+        )
+
+    if toggled.operator_id is not None:
+        await record_status_change(
+            session,
+            db_operation.id,
+            toggled.operator_id,
+            toggled.status,
+            toggled.required_amount,
+            toggled.current_amount,
+            toggled.deadline,
+        )
+    await session.commit()
+    await session.refresh(db_operation)
+
+    if db_operation.status:
+        await order_books.share_change("reload", operation_id=db_operation.id)
+    else:
+        await order_books.share_change("close", operation_ids=[db_operation.id])
+    await listing_cache.invalidate("operations")
+    await event_hub.publish("operation.status_changed", operation_payload(db_operation))
 
     return JSONResponse(content={"message": "Operación actualizada con éxito."}, status_code=200)
 
 
+@app.get("/api/operator/operations/{operation_id}/order-book")
+async def operation_order_book(operation_id: EntityId, request: Request, session: AsyncSession = Depends(get_session)):
+    user = await authenticate_user(session, request.cookies.get("token"))
+    operation = await session.get(Operation, operation_id)
+
+    if not operation:
+        raise HTTPException(status_code=404, detail="Operation not found")
+    if operation.operator_id != user.id and user.role != "Admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
+
+    book = order_books.books.get(operation_id)
+    if book is None:
+        book = await order_books.load_operation(session, operation_id)
+
+    return book.allocate()
+
+
+@app.get("/api/admin/order-books/allocations")
+async def order_book_allocations(
+    request: Request,
+    include_fills: bool = False,
+    session: AsyncSession = Depends(get_read_session)
+):
+    user = await authenticate_user(session, request.cookies.get("token"))
+    if user.role != "Admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
+
+    return order_books.allocate_all(include_fills=include_fills)
+
+
+@app.get("/events/operations")
+async def operation_events(request: Request, session: AsyncSession = Depends(get_read_session)):
+    await authenticate_user(session, request.cookies.get("token"))
+
+    return StreamingResponse(
+        event_hub.stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/investor_dashboard", response_class=HTMLResponse)
-async def investor_dashboard(request: Request):
-    user = await authenticate_user(request.cookies.get("token"))
+async def investor_dashboard(request: Request, session: AsyncSession = Depends(get_read_session)):
+    user = await authenticate_user(session, request.cookies.get("token"))
     if user.role != "Investor":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
 
-    return templates.TemplateResponse("investor_dashboard.html", {"request": request, "user": user})
+    stats = await get_investor_stats(session, user.id)
+    return templates.TemplateResponse("investor_dashboard.html", {"request": request, "user": user, "stats": stats})
 
 
 @app.get("/investor/operations")
-async def list_investor_operations_page(request: Request):
-    user = await authenticate_user(request.cookies.get("token"))
-    operations = session.query(Operation).filter(Operation.status == True).all()
-
-    operations_list = [
-        {
-            'id': operation.id,
-            'operator_id': operation.operator_id,
-            'annual_interest': float(operation.annual_interest),
-            'current_amount': float(operation.current_amount),
-            'created_at': operation.created_at.strftime("%d-%m-%Y"),
-            'required_amount': float(operation.required_amount),
-            'status': operation.status,
-            'deadline': operation.deadline.strftime("%d-%m-%Y"),
-        }
-        for operation in operations
-    ]
-
-    return templates.TemplateResponse("investor_operations.html", {"request": request, "operations": operations_list})
+async def list_investor_operations_page(request: Request, session: AsyncSession = Depends(get_read_session)):
+    await authenticate_user(session, request.cookies.get("token"))
+
+    return streaming_templates.StreamingTemplateResponse("investor_operations.html", {"request": request})
+
+
+@app.get("/api/investor/operations", response_model=OperationPage)
+async def api_investor_operations(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    sort: str = "-created_at",
+    operator_id: Optional[EntityId] = None,
+    status_filter: bool = Query(True, alias="status"),
+    min_interest: Optional[float] = None,
+    max_interest: Optional[float] = None,
+    deadline_from: Optional[date] = None,
+    deadline_to: Optional[date] = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    await authenticate_user(session, request.cookies.get("token"))
+
+    return await cached_operations_page(
+        request,
+        session,
+        scope="investor",
+        cursor=cursor,
+        limit=limit,
+        sort=sort,
+        operator_id=operator_id,
+        status=status_filter,
+        min_interest=min_interest,
+        max_interest=max_interest,
+        deadline_from=deadline_from,
+        deadline_to=deadline_to,
+    )
 
 
 @app.post("/investor/make-offer")
-async def make_offer(bid_request: BidRequest, request: Request):
-    user = await authenticate_user(request.cookies.get("token"))
-    operation = session.query(Operation).filter(Operation.id == bid_request.operation_id).first()
-
-    if not operation:
-        raise HTTPException(status_code=404, detail="Operation not found")
+async def make_offer(bid_request: BidRequest, request: Request, session: AsyncSession = Depends(get_session)):
+    user = await authenticate_user(session, request.cookies.get("token"))
 
-    new_bid = Bid(
-        id=str(uuid.uuid4()),
+    placed = await place_bid(
+        session,
         investor_id=user.id,
         operation_id=bid_request.operation_id,
         invested_amount=bid_request.invested_amount,
         interest_rate=bid_request.interest_rate,
-        bid_date=datetime.now(),
     )
+    await order_books.share_change("bid", **bid_change(placed["bid"]))
+    if not placed["status"]:
+        await order_books.share_change("close", operation_ids=[bid_request.operation_id])
+    await listing_cache.invalidate("operations")
+
+    await event_hub.publish("bid.placed", {
+        "operation_id": bid_request.operation_id,
+        "invested_amount": float(placed["bid"].invested_amount),
+        "interest_rate": float(placed["bid"].interest_rate),
+    })
+    await event_hub.publish("operation.funding_changed", {
+        "id": bid_request.operation_id,
+        "current_amount": float(placed["current_amount"]),
+        "required_amount": float(placed["required_amount"]),
+        "status": placed["status"],
+    })
+
+    return {
+        "message": "Oferta enviada exitosamente",
+        "current_amount": float(placed["current_amount"]),
+        "status": placed["status"],
+    }
 
-    session.add(new_bid)
-    session.commit()
 
-    return {"message": "Oferta enviada exitosamente"}
+@app.get("/investor/my-bids")
+async def get_user_bids(request: Request, archived: bool = False, session: AsyncSession = Depends(get_read_session)):
+    user = await authenticate_user(session, request.cookies.get("token"))
 
+    # Bids of archived operations live in the cold tables and are only read when asked for.
+    bids = stream_rows(investor_bids_query(user.id, archived=archived))
+    return streaming_templates.StreamingTemplateResponse(
+        "my_bids.html", {"request": request, "bids": bids, "archived": archived}
+    )
 
-@app.get("/investor/my-bids")
-async def get_user_bids(request: Request):
-    user = await authenticate_user(request.cookies.get("token"))
 
-    bids = session.query(Bid).filter(Bid.investor_id == user.id).all()
+@app.get("/api/investor/portfolio", response_model=PortfolioSummary)
+async def investor_portfolio(request: Request, session: AsyncSession = Depends(get_read_session)):
+    user = await authenticate_user(session, request.cookies.get("token"))
 
-    return templates.TemplateResponse("my_bids.html", {"request": request, "bids": bids})
+    return await get_portfolio_summary(session, user.id)
+
+
+@app.get("/api/investor/projections", response_model=PortfolioProjection)
+async def investor_projections(
+    request: Request,
+    as_of: Optional[date] = None,
+    method: str = "simple",
+    basis: int = 365,
+    session: AsyncSession = Depends(get_read_session),
+):
+    user = await authenticate_user(session, request.cookies.get("token"))
+    check_conventions(method, basis)
+
+    return await project_investor(session, user.id, as_of or date.today(), method, basis)
 
 
 @app.get("/admin_dashboard", response_class=HTMLResponse)
-async def admin_dashboard(request: Request):
-    user = await authenticate_user(request.cookies.get("token"))
+async def admin_dashboard(request: Request, session: AsyncSession = Depends(get_read_session)):
+    user = await authenticate_user(session, request.cookies.get("token"))
     if user.role != "Admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
 
@@ -259,50 +523,168 @@ async def admin_dashboard(request: Request):
 
 
 @app.get("/admin/users", response_class=HTMLResponse)
-async def list_users(request: Request):
-    user = await authenticate_user(request.cookies.get("token"))
+async def list_users(request: Request, session: AsyncSession = Depends(get_read_session)):
+    user = await authenticate_user(session, request.cookies.get("token"))
     if user.role != "Admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
 
-    users = session.query(User).filter(User.id != user.id).all()
-    return templates.TemplateResponse("admin_users.html", {"request": request, "users": users})
+    users = stream_rows(select(User).where(User.id != user.id).order_by(User.email))
+    return streaming_templates.StreamingTemplateResponse("admin_users.html", {"request": request, "users": users})
 
 
 @app.post("/admin/users/add")
-async def add_user(request: Request):
+async def add_user(request: Request, session: AsyncSession = Depends(get_session)):
     user_data = await request.json()
-    admin_user = await authenticate_user(request.cookies.get("token"))
+    admin_user = await authenticate_user(session, request.cookies.get("token"))
 
     if admin_user.role != "Admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
 
+    existing_user = await get_user_by_email(session, user_data["email"])
+    if existing_user:
+        raise HTTPException(status_code=400, detail="El correo ya está registrado.")
+
     new_user = User(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         first_name=user_data["first_name"],
         last_name=user_data["last_name"],
         nickname=user_data["nickname"],
         email=user_data["email"],
         phone=user_data["phone"],
-        password=pwd_context.hash(user_data["password"]),
+        password=await hash_password(user_data["password"]),
         role=user_data["role"],
         country=user_data["country"],
         state=user_data["state"],
         city=user_data["city"]
     )
     session.add(new_user)
-    session.commit()
+    await session.commit()
 
     return {"message": "Usuario añadido exitosamente", "user_id": new_user.id}
 
 
+@app.post("/admin/users/import", status_code=status.HTTP_202_ACCEPTED)
+async def import_users(
+    request: Request,
+    fmt: str = Query("csv", alias="format"),
+    session: AsyncSession = Depends(get_session)
+):
+    user = await authenticate_user(session, request.cookies.get("token"))
+    if user.role != "Admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
+
+    job = await start_import(request, fmt)
+    return {"job_id": job.id, "status_url": f"/admin/users/import/{job.id}"}
+
+
+@app.get("/admin/users/import/{job_id}")
+async def import_users_status(job_id: EntityId, request: Request, session: AsyncSession = Depends(get_session)):
+    user = await authenticate_user(session, request.cookies.get("token"))
+    if user.role != "Admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
+
+    # Progress is read from the primary: a replica may lag behind the worker running the import.
+    job = await get_import_job(session, job_id)
+    return job.report()
+
+
 @app.delete("/admin/users/delete/{user_id}")
-async def delete_user(user_id: str):
-    user = get_user_by_id(user_id)
+async def delete_user(user_id: EntityId, session: AsyncSession = Depends(get_session)):
+    user = await get_user_by_id(session, user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-    session.delete(user)
-    session.commit()
+    await session.delete(user)
+    await session.commit()
 
     return {"detail": "Usuario eliminado exitosamente"}
+
+
+@app.get("/admin/export/operations")
+async def export_operations(
+    request: Request,
+    fmt: str = Query("ndjson", alias="format"),
+    since: Optional[datetime] = None,
+    operator_id: Optional[EntityId] = None,
+    status_filter: Optional[bool] = Query(None, alias="status"),
+    session: AsyncSession = Depends(get_read_session)
+):
+    user = await authenticate_user(session, request.cookies.get("token"))
+    if user.role != "Admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
+
+    query = export_query("operations")
+    if since is not None:
+        query = query.where(Operation.created_at >= since)
+    if operator_id is not None:
+        query = query.where(Operation.operator_id == operator_id)
+    if status_filter is not None:
+        query = query.where(Operation.status == status_filter)
+
+    return export_response("operations", query.order_by(Operation.created_at, Operation.id), fmt)
+
+
+@app.get("/admin/export/bids")
+async def export_bids(
+    request: Request,
+    fmt: str = Query("ndjson", alias="format"),
+    since: Optional[datetime] = None,
+    investor_id: Optional[EntityId] = None,
+    operation_id: Optional[EntityId] = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    user = await authenticate_user(session, request.cookies.get("token"))
+    if user.role != "Admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
+
+    query = export_query("bids")
+    if since is not None:
+        query = query.where(Bid.bid_date >= since)
+    if investor_id is not None:
+        query = query.where(Bid.investor_id == investor_id)
+    if operation_id is not None:
+        query = query.where(Bid.operation_id == operation_id)
+
+    return export_response("bids", query.order_by(Bid.bid_date, Bid.id), fmt)
+
+
+@app.get("/admin/export/users")
+async def export_users(
+    request: Request,
+    fmt: str = Query("ndjson", alias="format"),
+    role: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    user = await authenticate_user(session, request.cookies.get("token"))
+    if user.role != "Admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
+
+    query = export_query("users")
+    if role is not None:
+        query = query.where(User.role == role)
+
+    return export_response("users", query.order_by(User.id), fmt)
+
+
+@app.get("/api/admin/cache-stats")
+async def cache_stats(request: Request, session: AsyncSession = Depends(get_read_session)):
+    user = await authenticate_user(session, request.cookies.get("token"))
+    if user.role != "Admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso")
+
+    return {"principals": principal_cache.stats(), "operation_listings": listing_cache.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_metrics({
+        "principal_cache_hits": principal_cache.hits,
+        "principal_cache_misses": principal_cache.misses,
+        "operation_listing_cache_hits": listing_cache.hits,
+        "operation_listing_cache_misses": listing_cache.misses,
+        "event_subscribers": len(event_hub.subscribers),
+        "order_books_open": len(order_books.books),
+        "db_replica_lag_seconds": replica_monitor.lag,
+        "db_replica_healthy": int(replica_monitor.healthy),
+    })
@@ -0,0 +1,240 @@
+"""Multi-process production server: forks one uvicorn worker per CPU on a shared socket."""
+import argparse
+import asyncio
+import os
+import select
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import uvicorn
+from dotenv import load_dotenv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Workers that crash before staying up this long are respawned with a doubling delay.
+RESPAWN_STABLE_AFTER = 30.0
+RESPAWN_MAX_DELAY = 30.0
+
+
+def default_workers() -> int:
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+async def run_migrations():
+    """alembic upgrade head, serialized across every launcher that starts at the same time."""
+    from connection import dispose_engine
+    from locks import exclusive_lock
+
+    async with exclusive_lock("migrations"):
+        await asyncio.to_thread(subprocess.run, ["alembic", "upgrade", "head"], cwd=ROOT, check=True)
+    # The lock opened an engine in the master; workers must not inherit its connections.
+    await dispose_engine()
+
+
+class Worker(uvicorn.Server):
+    """uvicorn server that writes to a pipe once its lifespan has run and it is accepting."""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            os.write(self.ready_fd, b"1")
+        os.close(self.ready_fd)
+
+
+class Master:
+    def __init__(
+        self, app, sock: socket.socket, workers: int, graceful_timeout: float, ready_timeout: float, log_level: str
+    ):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.ready_timeout = ready_timeout
+        self.log_level = log_level
+        self.children = {}
+        self.ready_pipes = {}
+        self.draining = set()
+        self.crashes = 0
+        self.next_spawn = 0.0
+        self.stopping = False
+        self.restart_requested = False
+
+    def spawn(self):
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(ready_write)
+            self.children[pid] = time.monotonic()
+            self.ready_pipes[pid] = ready_read
+            return pid
+        # Child: forget the master's handlers, uvicorn installs its own for a graceful shutdown.
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, signal.SIG_DFL)
+        os.close(ready_read)
+        for fd in self.ready_pipes.values():
+            os.close(fd)
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            log_level=self.log_level,
+            timeout_graceful_shutdown=self.graceful_timeout,
+        )
+        code = 1
+        try:
+            Worker(config, ready_write).run(sockets=[self.sock])
+            code = 0
+        finally:
+            os._exit(code)
+
+    def wait_ready(self, pid: int) -> bool:
+        """Block until the worker reports it is serving; False if it died, timed out or we are stopping."""
+        fd = self.ready_pipes.get(pid)
+        deadline = time.monotonic() + self.ready_timeout
+        while fd is not None and not self.stopping and time.monotonic() < deadline:
+            readable, _, _ = select.select([fd], [], [], 0.5)
+            if readable:
+                # Empty when the worker exited before writing: its end of the pipe was closed.
+                return os.read(fd, 1) == b"1"
+        return False
+
+    def drain(self, pid: int):
+        self.draining.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def reap(self) -> list:
+        exited = []
+        while self.children:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            started = self.children.pop(pid, None)
+            fd = self.ready_pipes.pop(pid, None)
+            if fd is not None:
+                os.close(fd)
+            if started is not None and pid not in self.draining and not self.stopping:
+                self.record_exit(time.monotonic() - started)
+            self.draining.discard(pid)
+            exited.append(pid)
+        return exited
+
+    def record_exit(self, uptime: float):
+        """Delay the next spawn exponentially while workers keep crashing soon after starting."""
+        if uptime >= RESPAWN_STABLE_AFTER:
+            self.crashes = 0
+            return
+        self.crashes += 1
+        delay = min(RESPAWN_MAX_DELAY, 2 ** (self.crashes - 1))
+        self.next_spawn = time.monotonic() + delay
+        print(f"Worker exited after {uptime:.1f}s, respawning in {delay:.0f}s", file=sys.stderr)
+
+    def rolling_restart(self):
+        for old in list(self.children):
+            new = self.spawn()
+            # The old worker keeps accepting until its replacement has run its lifespan.
+            if not self.wait_ready(new):
+                print(f"Worker {new} did not become ready, stopping the rolling restart", file=sys.stderr)
+                self.drain(new)
+                return
+            self.drain(old)
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def request_restart(self, *_):
+        self.restart_requested = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, self.request_restart)
+        for _ in range(self.workers):
+            self.spawn()
+
+        while not self.stopping:
+            time.sleep(0.5)
+            self.reap()
+            if self.restart_requested:
+                self.restart_requested = False
+                self.rolling_restart()
+            while not self.stopping and len(self.children) < self.workers and time.monotonic() >= self.next_spawn:
+                self.spawn()
+
+        for pid in list(self.children):
+            self.drain(pid)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self.reap()
+        for pid in list(self.children):
+            os.kill(pid, signal.SIGKILL)
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=default_workers(), help="defaults to WEB_CONCURRENCY or the CPUs")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--graceful-timeout", type=float, default=30, help="seconds a draining worker may take")
+    parser.add_argument(
+        "--ready-timeout", type=float, default=60, help="seconds a restarted worker may take to start serving"
+    )
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--migrate", action="store_true", help="run alembic upgrade head before starting")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if not os.getenv("SECRET_KEY"):
+        sys.exit("SECRET_KEY must be set: every worker has to sign and verify tokens with the same key")
+    if args.workers > 1:
+        missing = [name for name in ("RESPONSE_CACHE_URL", "EVENTS_BACKEND_URL") if not os.getenv(name)]
+        if missing:
+            sys.exit(
+                f"{' and '.join(missing)} must be set to run more than one worker: listing versions, live events, "
+                "order books and principal cache invalidations are shared through them (or pass --workers 1)"
+            )
+        # Per-process buckets would grant every client its budget once per worker.
+        os.environ.setdefault("RATE_LIMIT_URL", os.environ["RESPONSE_CACHE_URL"])
+    # bcrypt threads of all workers share the same cores.
+    os.environ.setdefault("HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+
+    if args.migrate:
+        asyncio.run(run_migrations())
+
+    # Preload: workers are forked with the app already imported. Importing it opens no connection.
+    from main import app
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    Master(app, sock, args.workers, args.graceful_timeout, args.ready_timeout, args.log_level).run()
+
+
+if __name__ == "__main__":
+    main()
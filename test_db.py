@@ -1,5 +1,12 @@
-from connection import session
+import asyncio
+from sqlalchemy import select
+from connection import SessionLocal
 from models import User
 
-users = session.query(User).all()
-print(users)
\ No newline at end of file
+
+async def main():
+    async with SessionLocal() as session:
+        users = (await session.execute(select(User))).scalars().all()
+        print(users)
+
+asyncio.run(main())